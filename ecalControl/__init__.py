@@ -1,8 +1,18 @@
 from .abstract import *
+from .ecalInstrumentation import ECalInstrumentation
 from .ecalHalBase import ECalHal
+from .ecalHalImage import ECalHalImage
+from .ecalHalAsync import ECalHalAsync
 from .ecalControlBase import ECalControl
+from .ecalControlAsync import AsyncECalControl
 from .ecalCorrectionSetBase import ECalCorrectionSet
 from .ecalStandardBase import ECalStandard
+from .ecalDownloadJob import ECalDownloadJob, ECalDownloadProgress, ECalDownloadOrchestrator, ECalDownloadSummary
+from .ecalMetadataCache import ECalMetadataCache
+from .ecalReadPlanner import ECalReadPlanner, ECalFlashSnapshot
+from .ecalWarmupScheduler import ECalWarmupScheduler, ECalPreparationStatus
+from .ecalDeviceRegistry import ECalDeviceRegistry
+from .ecalBenchmark import ECalBenchmark, ECalBenchmarkResult
 from .rfAdapter import RfAdapter
 
 
@@ -11,6 +21,15 @@ try:
     from .ecalControlSkrf import ECalControlSk
     from .ecalCorrectionSetSkrf import ECalCorrectionSetSk
     from .ecalStandardSkrf import ECalStandardSk
+    from .ecalHalSim import ECalHalSim, ECalLatencyProfile
+    from .ecalStandardCache import ECalStandardCache, ECalStandardStore
+except:
+    pass
+
+try:
+    import socketserver
+    from .ecalService import ECalService, ECalServiceClient, ECalHalService, ECalServiceError
+    from .ecalService import ECalServiceClientSk
 except:
     pass
 
@@ -22,6 +41,6 @@ except:
 
 try:
     import camino
-    from .ecalHalCamino import ECalHalCamino
+    from .ecalHalCamino import ECalHalCamino, ECalHalCaminoAsync
 except:
     pass
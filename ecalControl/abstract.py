@@ -1,8 +1,9 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from enum import Enum
-from typing import List
+from typing import List, Iterator, AsyncIterator
 from pathlib import Path
+import numpy as np
 
 
 class CorrectionSetScope(Enum):
@@ -63,10 +64,26 @@ class ECalHalAbc(ABC):
 
     _MUX_ADDR_FLASH_DATA = 7
 
+    _FLASH_SIZE = 0x40000 #18 address bits
+
+    #max number of sequential flash bytes the HAL can return in a single round trip
+    _MAX_BLOCK_LENGTH = 1
+
+    #ECalInstrumentation collecting transaction counters, None when disabled
+    _instrumentation = None
+
     @abstractmethod
     def __init__(self) -> None:
         pass 
 
+    def attachInstrumentation(self, instrumentation) -> None:
+        '''Counts this HAL's transactions into the given ECalInstrumentation, None detaches it'''
+        self._instrumentation = instrumentation
+
+    @property
+    def instrumentation(self):
+        return self._instrumentation
+
     @abstractmethod
     def _writeByte(self,addr: int, value: int) -> None:
         pass
@@ -75,6 +92,40 @@ class ECalHalAbc(ABC):
     def _readByteFromFlash(self, addr: int) -> int:
         pass
 
+    @abstractmethod
+    def _readBlockFromFlash(self, addr: int, length: int) -> bytes:
+        pass
+
+    @abstractmethod
+    def _reset(self) -> None:
+        pass
+
+    @abstractmethod
+    def _streamBlocksFromFlash(self, addr: int, length: int) -> Iterator[tuple[int, bytes]]:
+        pass
+
+
+class ECalHalAsyncAbc(ABC):
+    '''
+    asyncio flavour of the ECal hardware abstraction layer
+    '''
+
+    @abstractmethod
+    async def readBlock(self, addr: int, length: int) -> bytes:
+        pass
+
+    @abstractmethod
+    async def writeByte(self, addr: int, value: int) -> None:
+        pass
+
+    @abstractmethod
+    async def setGates(self, value: int) -> None:
+        pass
+
+    @abstractmethod
+    def streamBlocks(self, addr: int, length: int) -> AsyncIterator[tuple[int, bytes]]:
+        pass
+
 
 class ECalControlAbc(ABC):
 
@@ -100,13 +151,17 @@ class ECalControlAbc(ABC):
 
     @property
     @abstractmethod
-    def frequencyList(self) -> list[float]:
+    def frequencyList(self) -> np.ndarray:
         pass
 
     @abstractmethod
     def setGates(self, value: int) -> None:
         pass
 
+    @abstractmethod
+    def readBytesFromFlash(self, addr, length) -> bytes:
+        pass
+
     @abstractmethod
     def readValueFromFlash(self, addr, format = "c") -> any:
         pass
@@ -116,7 +171,7 @@ class ECalControlAbc(ABC):
         pass 
 
     @abstractmethod  
-    def readArrayFromFlash(self, addr, len, format = "i") -> List[any]:
+    def readArrayFromFlash(self, addr, len, format = "i") -> np.ndarray:
         pass
 
     @property
@@ -225,5 +280,5 @@ class ECalStandardAbc(ABC):
         pass
 
     @abstractmethod
-    def fetchDataFromEEPROM(self) -> List[List[complex]]:
+    def fetchDataFromEEPROM(self, buffer: bytes = None) -> np.ndarray:
         pass
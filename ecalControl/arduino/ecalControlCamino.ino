@@ -31,6 +31,13 @@
 
 #define Pin_MUX_Flash_CEn 7
 
+#define DEFAULT_BAUD 115200
+#define BAUD_CONFIRM_TIMEOUT_MS 4000
+
+#define STREAM_SYNC_BYTE_1 0x5A
+#define STREAM_SYNC_BYTE_2 0xA5
+#define STREAM_MAX_CHUNK_LENGTH 250
+
 #define Pin_Prsnt_Relay 21
 #define Pin_5V_detect 1
 #define Pin_Pulldown 0
@@ -246,6 +253,24 @@ unsigned long read_FlashL(unsigned long address)
   return data;
 }
 
+void read_FlashBlock(unsigned long address, byte* buffer, byte length)
+{
+  for (byte i = 0; i < length; i++)
+  {
+    buffer[i] = read_Flash(address + i);
+  }
+}
+
+word crc16_update(word crc, byte data)
+{
+  crc ^= ((word)data) << 8;
+  for (byte i = 0; i < 8; i++)
+  {
+    crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : (crc << 1);
+  }
+  return crc;
+}
+
 byte read_FlashS(unsigned long address, char* buffer, byte maxLen)
 {
   byte data;
@@ -276,7 +301,7 @@ void setup() {
   pinMode(Pin_Pulldown,OUTPUT);
   digitalWrite(Pin_Pulldown,LOW);
 
-  camino.begin(115200);
+  camino.begin(DEFAULT_BAUD);
 
 
   //enable_presence_detect();
@@ -285,8 +310,92 @@ void setup() {
 
 unsigned long lastEepromAddress = 0;
 
+//set by callables (from the serial ISR), served in loop()
+volatile bool streamPending = false;
+volatile unsigned long streamAddress = 0;
+volatile unsigned long streamRemaining = 0;
+volatile byte streamChunkLength = 0;
+
+volatile unsigned long pendingBaud = 0;
+volatile bool baudUnconfirmed = false;
+unsigned long baudConfirmDeadline = 0;
+
+//wait until camino has handed the last byte of its response packet to the USART
+void wait_for_response_sent()
+{
+  while (USART3.CTRLA & USART_DREIE_bm) {}
+  delay(1);
+}
+
+void stream_send_byte(byte data)
+{
+  while (!(USART3.STATUS & USART_DREIF_bm)) {}
+  USART3.TXDATAL = data;
+}
+
+//frame: sync1 sync2 addr[3] len data[len] crc16[2], crc over addr, len and data
+//a frame with len 0 marks the end of the stream
+void stream_send_frame(unsigned long address, byte* buffer, byte length)
+{
+  word crc = 0xFFFF;
+  byte header[4] = {(byte)(address & 0xFF), (byte)((address >> 8) & 0xFF), (byte)((address >> 16) & 0xFF), length};
+
+  stream_send_byte(STREAM_SYNC_BYTE_1);
+  stream_send_byte(STREAM_SYNC_BYTE_2);
+  for (byte i = 0; i < 4; i++)
+  {
+    stream_send_byte(header[i]);
+    crc = crc16_update(crc, header[i]);
+  }
+  for (byte i = 0; i < length; i++)
+  {
+    stream_send_byte(buffer[i]);
+    crc = crc16_update(crc, buffer[i]);
+  }
+  stream_send_byte(crc & 0xFF);
+  stream_send_byte(crc >> 8);
+}
+
+void stream_flash()
+{
+  byte buffer[STREAM_MAX_CHUNK_LENGTH];
+
+  wait_for_response_sent();
+  while (streamRemaining > 0)
+  {
+    byte length = streamRemaining < streamChunkLength ? streamRemaining : streamChunkLength;
+    read_FlashBlock(streamAddress, buffer, length);
+    stream_send_frame(streamAddress, buffer, length);
+    streamAddress += length;
+    streamRemaining -= length;
+  }
+  stream_send_frame(streamAddress, buffer, 0);
+  lastEepromAddress = streamAddress - 1;
+  streamPending = false;
+}
+
 void loop() 
 {
+  if (streamPending)
+  {
+    stream_flash();
+  }
+
+  if (pendingBaud != 0)
+  {
+    wait_for_response_sent();
+    camino.begin(pendingBaud);
+    pendingBaud = 0;
+    baudUnconfirmed = true;
+    baudConfirmDeadline = millis() + BAUD_CONFIRM_TIMEOUT_MS;
+  }
+
+  //host didn't get through at the new baud rate, fall back so it can reconnect
+  if (baudUnconfirmed && (long)(millis() - baudConfirmDeadline) >= 0)
+  {
+    camino.begin(DEFAULT_BAUD);
+    baudUnconfirmed = false;
+  }
 }
 
 
@@ -319,6 +428,50 @@ void readNextByteFromFlash(byte dataLength, byte *dataArray) {
   returns(read_Flash(lastEepromAddress));
 }
 
+void readBlockFromFlash(byte dataLength, byte *dataArray) {
+  if (dataLength != 4) return; //need 3 bytes address, 1 byte length
+
+  unsigned long address = 0;
+  memcpy((byte*)&address, dataArray, 3);
+  byte length = dataArray[3];
+  if (length > MAX_DATA_LENGTH) length = MAX_DATA_LENGTH;
+  if (length == 0) return;
+
+  byte buffer[MAX_DATA_LENGTH];
+  read_FlashBlock(address, buffer, length);
+  lastEepromAddress = address + length - 1;
+  returns(length, buffer);
+}
+
+
+void streamFlash(byte dataLength, byte *dataArray) {
+  if (dataLength != 7) return; //need 3 bytes address, 3 bytes length, 1 byte chunk length
+
+  unsigned long address = 0;
+  unsigned long length = 0;
+  memcpy((byte*)&address, dataArray, 3);
+  memcpy((byte*)&length, dataArray + 3, 3);
+  streamAddress = address;
+  streamRemaining = length;
+  streamChunkLength = dataArray[6];
+  if (streamChunkLength == 0 || streamChunkLength > STREAM_MAX_CHUNK_LENGTH) streamChunkLength = STREAM_MAX_CHUNK_LENGTH;
+
+  //frames are sent from loop() once this command's response is out
+  streamPending = true;
+}
+
+void setBaudRate(byte dataLength, byte *dataArray) {
+  if (dataLength != 4) return; //need 4 bytes baud rate
+
+  unsigned long baud = 0;
+  memcpy((byte*)&baud, dataArray, 4);
+  //switched over in loop() once this command's response is out
+  pendingBaud = baud;
+}
+
+void confirmBaudRate(byte dataLength, byte *dataArray) {
+  baudUnconfirmed = false;
+}
 
 
 BEGIN_CALLABLES {
@@ -326,6 +479,10 @@ BEGIN_CALLABLES {
   {"writeByte", writeByte},
   {"readByteFromFlash", readByteFromFlash},
   {"readNextByteFromFlash", readNextByteFromFlash},
+  {"readBlockFromFlash", readBlockFromFlash},
+  {"streamFlash", streamFlash},
+  {"setBaudRate", setBaudRate},
+  {"confirmBaudRate", confirmBaudRate},
 } END_CALLABLES;
 
 
@@ -0,0 +1,169 @@
+import json
+import random
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, List, Type
+
+from .abstract import ECalHalAbc
+from .abstract import CorrectionSetScope
+from .ecalControlBase import ECalControl
+from .ecalInstrumentation import ECalInstrumentation
+
+
+@dataclass(frozen=True)
+class ECalBenchmarkResult:
+    benchmark: str
+    hal: str
+    label: str
+    serialNo: str
+    bytes: int
+    operations: int
+    seconds: float
+    simulated: bool
+    timestamp: str
+
+    @property
+    def bytesPerSecond(self) -> float:
+        return self.bytes / self.seconds if self.seconds > 0 else float("inf")
+
+    @property
+    def operationsPerSecond(self) -> float:
+        return self.operations / self.seconds if self.seconds > 0 else float("inf")
+
+    def toDict(self) -> dict:
+        record = asdict(self)
+        record["bytesPerSecond"] = self.bytesPerSecond
+        record["operationsPerSecond"] = self.operationsPerSecond
+        return record
+
+    def __str__(self) -> str:
+        clock = "simulated" if self.simulated else "measured"
+        return f"{self.hal} {self.label} {self.benchmark}: {self.bytes} bytes / {self.operations} op(s) in {self.seconds:.3f}s {clock} - {self.bytesPerSecond:.0f} Byte/s, {self.operationsPerSecond:.1f} op/s"
+
+
+class ECalBenchmark():
+    '''
+    Flash throughput and switching benchmarks for one HAL, on real hardware or on ECalHalSim.
+    HALs keeping a simulated clock (elapsedTime) are timed by it, others by the wall clock.
+    Results are appended as JSON lines by writeRecords, label them (adapter, firmware, commit) to compare versions.
+    '''
+
+    BENCHMARKS = ["randomByteReads", "sequentialRead", "headerParsing", "correctionSetFetch", "gateSwitching"]
+
+    def __init__(self,
+                 hal: ECalHalAbc,
+                 label: str = "",
+                 ecalType: Type[ECalControl] = ECalControl,
+                 samples: int = 64,
+                 sequentialLength: int = 4096,
+                 gateSwitches: int = 64,
+                 scope: CorrectionSetScope = CorrectionSetScope.PORT_A,
+                 seed: int = 0) -> None:
+
+        self._hal = hal
+        self._label = label
+        self._ecalType = ecalType
+        self._samples = samples
+        self._sequentialLength = sequentialLength
+        self._gateSwitches = gateSwitches
+        self._scope = scope
+        self._random = random.Random(seed)
+        self._simulated = hasattr(hal, "elapsedTime")
+
+        self._ecal : ECalControl = None
+        self._results : List[ECalBenchmarkResult] = []
+
+
+    @property
+    def results(self) -> List[ECalBenchmarkResult]:
+        return self._results
+
+    @property
+    def ecal(self) -> ECalControl:
+        '''Control object used by the benchmarks working on the module's data, opened on first use'''
+        if self._ecal == None: self._ecal = self._ecalType(self._hal)
+        return self._ecal
+
+
+    def _now(self) -> float:
+        return self._hal.elapsedTime if self._simulated else time.perf_counter()
+
+    def _measure(self, benchmark: str, func: Callable[[], tuple[int, int]]) -> ECalBenchmarkResult:
+        '''Times func, which returns the (bytes, operations) it did'''
+        start = self._now()
+        numBytes, operations = func()
+        seconds = self._now() - start
+
+        serialNo = self._ecal.serialNo if self._ecal != None else ""
+        result = ECalBenchmarkResult(benchmark, type(self._hal).__name__, self._label, serialNo, numBytes, operations, seconds,
+                                     self._simulated, datetime.now(timezone.utc).isoformat(timespec="seconds"))
+        self._results.append(result)
+        return result
+
+
+    def randomByteReads(self) -> ECalBenchmarkResult:
+        addresses = [self._random.randrange(self._hal._FLASH_SIZE) for i in range(self._samples)]
+        def run():
+            for addr in addresses: self._hal._readByteFromFlash(addr)
+            return len(addresses), len(addresses)
+        return self._measure("randomByteReads", run)
+
+    def sequentialRead(self) -> ECalBenchmarkResult:
+        def run():
+            for blockAddr, block in self._hal._streamBlocksFromFlash(ECalControl._EEPROM_ADDR_NOPOINTS, self._sequentialLength): pass
+            return self._sequentialLength, 1
+        return self._measure("sequentialRead", run)
+
+    def headerParsing(self) -> ECalBenchmarkResult:
+        '''Opens the module from scratch: info block, correction set headers and standard id tables'''
+        def run():
+            previous = self._hal._instrumentation
+            instrumentation = ECalInstrumentation()
+            self._hal.attachInstrumentation(instrumentation)
+            try:
+                self._hal._reset()
+                self._ecal = self._ecalType(self._hal)
+                self._ecal.loadHeaders()
+            finally:
+                self._hal.attachInstrumentation(previous)
+            flashBytes = sum(entry["events"].get("flashBytes", 0) for entry in instrumentation.toDict().values())
+            return int(flashBytes), 1
+        return self._measure("headerParsing", run)
+
+    def correctionSetFetch(self) -> ECalBenchmarkResult:
+        '''Reads and decodes the data of all standards in the set, starting from a cold cache'''
+        ecal = self.ecal
+        ecal._flashCache.invalidate()
+        def run():
+            standards = list(ecal.correctionSets[self._scope])
+            for std in standards: std.fetchDataFromEEPROM()
+            return sum(std.dataLengthInEEPROM for std in standards), len(standards)
+        return self._measure("correctionSetFetch", run)
+
+    def gateSwitching(self) -> ECalBenchmarkResult:
+        ecal = self.ecal
+        def run():
+            for i in range(self._gateSwitches): ecal.setGates(0xffff if i % 2 else 0x0000)
+            ecal.isolate()
+            return 0, self._gateSwitches + 1
+        return self._measure("gateSwitching", run)
+
+
+    def run(self, benchmarks: List[str] = None) -> List[ECalBenchmarkResult]:
+        '''Runs the given benchmarks (all by default) in order, returns their results'''
+        if benchmarks == None: benchmarks = ECalBenchmark.BENCHMARKS
+        self.ecal #serial number for the records
+        return [getattr(self, benchmark)() for benchmark in benchmarks]
+
+
+    def writeRecords(self, path: Path) -> None:
+        '''Appends the results as JSON lines'''
+        with open(path, "a") as f:
+            for result in self._results:
+                f.write(json.dumps(result.toDict()) + "\n")
+
+    def readRecords(path: Path) -> List[dict]:
+        with open(path, "r") as f:
+            return [json.loads(line) for line in f if line.strip() != ""]
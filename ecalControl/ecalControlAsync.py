@@ -0,0 +1,84 @@
+from typing import Type
+
+import numpy as np
+
+from .abstract import ECalHalAbc
+from .abstract import ECalStandardAbc
+from .abstract import CorrectionSetScope
+from .ecalControlBase import ECalControl
+from .ecalHalAsync import ECalHalAsync
+
+
+class AsyncECalControl():
+    '''
+    asyncio facade over an ECalControl.
+    Switching and flash reads are awaited on the HAL's worker thread, so they can overlap VNA sweeps,
+    GPIB traffic or other modules in the same event loop.
+    '''
+
+    def __init__(self, ecal: ECalControl, asyncHal: ECalHalAsync = None) -> None:
+        self._ecal = ecal
+        self._asyncHal = asyncHal if asyncHal != None else AsyncECalControl.asyncHalFor(ecal.hal)
+        #gates written through the async HAL directly are unknown to the control's gate tracking
+        self._asyncHal.addGatesListener(ecal._forgetGates)
+
+
+    async def open(hal: ECalHalAbc,
+                   ecalType: Type[ECalControl] = ECalControl,
+                   asyncHalType: Type[ECalHalAsync] = None,
+                   **kwargs) -> 'AsyncECalControl':
+        '''Builds the ECal control object (and its header reads) on the HAL's worker thread,
+        with the async HAL matching the HAL's type unless asyncHalType is given'''
+        asyncHal = asyncHalType(hal) if asyncHalType != None else AsyncECalControl.asyncHalFor(hal)
+        ecal = await asyncHal.run(lambda: ecalType(hal, **kwargs))
+        return AsyncECalControl(ecal, asyncHal)
+
+    def asyncHalFor(hal: ECalHalAbc) -> ECalHalAsync:
+        '''Async HAL for the HAL's type, the generic one for HALs without a dedicated async HAL'''
+        try:
+            from .ecalHalCamino import ECalHalCamino, ECalHalCaminoAsync
+            if isinstance(hal, ECalHalCamino): return ECalHalCaminoAsync(hal)
+        except ImportError:
+            #camino is optional
+            pass
+        return ECalHalAsync(hal)
+
+
+    @property
+    def ecal(self) -> ECalControl:
+        return self._ecal
+
+    @property
+    def asyncHal(self) -> ECalHalAsync:
+        return self._asyncHal
+
+
+    async def setGates(self, value: int) -> None:
+        await self._asyncHal.run(self._ecal.setGates, value)
+
+    async def isolate(self) -> None:
+        await self._asyncHal.run(self._ecal.isolate)
+
+    async def activate(self, standard: ECalStandardAbc) -> None:
+        await self._asyncHal.run(standard.activate)
+
+    async def switchTo(self, standard: ECalStandardAbc) -> None:
+        await self._asyncHal.run(self._ecal.switchTo, standard)
+
+
+    async def readBytesFromFlash(self, addr: int, length: int) -> bytes:
+        return await self._asyncHal.run(self._ecal.readBytesFromFlash, addr, length)
+
+    async def frequencyList(self) -> np.ndarray:
+        return await self._asyncHal.run(lambda: self._ecal.frequencyList)
+
+    async def fetchDataFromEEPROM(self, standard: ECalStandardAbc) -> any:
+        return await self._asyncHal.run(standard.fetchDataFromEEPROM)
+
+    async def fetchCorrectionSet(self, scope: CorrectionSetScope) -> dict[int, any]:
+        '''Fetches the data of all standards in the set, keyed by standard id'''
+        return await self._asyncHal.run(lambda: self._ecal.fetchCorrectionSets([scope])[scope])
+
+
+    def close(self) -> None:
+        self._asyncHal.close()
@@ -2,8 +2,10 @@
 import struct
 from dataclasses import dataclass
 import re
+from contextlib import nullcontext
 from pathlib import Path
 from typing import List
+import numpy as np
 
 from .abstract import ECalHalAbc
 from .abstract import ECalControlAbc
@@ -11,14 +13,52 @@ from .abstract import ECalCorrectionSetAbc
 from .abstract import ConnectorGender
 from .abstract import CorrectionSetScope
 from .abstract import RfPort
+from .abstract import ECalStandardAbc
 from .ecalCorrectionSetBase import ECalCorrectionSet
+from .ecalHalImage import ECalHalImage
+from .ecalFlashCache import ECalFlashCache
+from .ecalDownloadJob import ECalDownloadJob
+from .ecalMetadataCache import ECalMetadataCache
+from .ecalReadPlanner import ECalReadPlanner, ECalFlashSnapshot
+from .ecalWarmupScheduler import ECalWarmupScheduler
 
 
 
 class ECalControl(ECalControlAbc):
 
-    def __init__(self, hal: ECalHalAbc):
+    #(address, max length) of the info block fields
+    _INFO_REGIONS = [(ECalControlAbc._EEPROM_ADDR_NOPOINTS, 2),
+                     (ECalControlAbc._EEPROM_ADDR_WARMUP, 2),
+                     (ECalControlAbc._EEPROM_ADDR_MODELNO, 37),
+                     (ECalControlAbc._EEPROM_ADDR_SERNO, 7),
+                     (ECalControlAbc._EEPROM_ADDR_CONNTYPE, 21),
+                     (ECalControlAbc._EEPROM_ADDR_LASTCERT, 33),
+                     (ECalControlAbc._EEPROM_ADDR_FREQ_NO, 2)]
+
+    #frequency count and address followed by the four correction set headers
+    _HEADER_REGION = (ECalControlAbc._EEPROM_ADDR_FREQ_NO, ECalControlAbc._EEPROM_ADDR_CORRSET4 + 14 - ECalControlAbc._EEPROM_ADDR_FREQ_NO)
+
+    def __init__(self, 
+                 hal: ECalHalAbc, 
+                 cachePageSize: int = None, 
+                 cacheMaxPages: int = 256, 
+                 cacheReadAheadPages: int = None,
+                 metadataCache: ECalMetadataCache = None):
+        '''Cache page size and read-ahead default to 256 bytes and 2 pages for HALs with burst reads, 
+        single byte pages without read-ahead otherwise. cacheMaxPages None keeps the whole flash once read.
+        Nothing is read from the module here, the info block and correction sets are read on first use.
+        With a metadata cache, a known module's info, correction set headers, standard ids and frequency list 
+        come from the cache after checking its fingerprint; an unknown module has them read once and stored.'''
         self.hal = hal
+        self._metadataCache = metadataCache
+
+        burst = hal._MAX_BLOCK_LENGTH > 1
+        if cachePageSize == None: cachePageSize = 256 if burst else 1
+        if cacheReadAheadPages == None: cacheReadAheadPages = 2 if burst else 0
+        if cacheMaxPages == None: cacheMaxPages = -(-hal._FLASH_SIZE // cachePageSize)
+        self._flashCache = ECalFlashCache(hal._readBlockFromFlash, hal._FLASH_SIZE, cachePageSize, cacheMaxPages, cacheReadAheadPages)
+        #flash content read ahead by a planned operation, served before the cache while it runs
+        self._snapshot : ECalFlashSnapshot = None
 
         self._numPoints = 0
         self._numFrequencies = 0
@@ -27,64 +67,164 @@ class ECalControl(ECalControlAbc):
         self._serialNo = ""
         self._connectorType = ""
         self._lastCalibration = ""
-        self._correctionSets = dict()
+        self._infoRead = False
+        self._correctionSets : dict[CorrectionSetScope, ECalCorrectionSetAbc] = None
         self._frequencyList = []
+        #gate word last latched, None while unknown (after opening or a reset)
+        self._gates : int = None
         self._dataFolderPath = Path(__file__).parent.resolve().joinpath("data")
         
         self._ports = []
 
-        self._readECalInfo()
-        self._readCorrectionSets()
+
+    def _operation(self, name: str):
+        '''Context attributing the HAL transactions within to the named operation, if the HAL is instrumented'''
+        if self.hal._instrumentation == None: return nullcontext()
+        return self.hal._instrumentation.operation(name)
+
+    @property
+    def instrumentation(self):
+        return self.hal._instrumentation
 
 
     @property
-    def frequencyList(self) -> list[float]:
+    def frequencyList(self) -> np.ndarray:
         if (len(self._frequencyList) == 0): #frequency list is empty, read it
-            freqListAddr = self.readValueFromFlash(ECalControl._EEPROM_ADDR_FREQ_ADDR,"I")
-            self._frequencyList = [self.readValueFromFlash(freqListAddr + i*8,"d") for i in range(self.numFrequencies)]
+            with self._operation("ECalControl.frequencyList"):
+                freqListAddr = self.readValueFromFlash(ECalControl._EEPROM_ADDR_FREQ_ADDR,"I")
+                self._frequencyList = self.readArrayFromFlash(freqListAddr, self.numFrequencies, "d")
         return self._frequencyList
 
     def setGates(self, value: int) -> None:
-        self.hal._writeByte(ECalHalAbc._MUX_ADDR_GATES_1_8, value & 0x00ff)
-        self.hal._writeByte(ECalHalAbc._MUX_ADDR_GATES_9_16, (value & 0xff00) >> 8)
+        '''Latches the gate word, gate bytes already latched aren't written again.
+        Gates written around this object (e.g. directly through the HAL) need isolate() to resynchronize.'''
+        value &= 0xffff
+        with self._operation("ECalControl.setGates"):
+            latched = self._gates
+            #unknown until both bytes are written, a failed write leaves the latches half switched
+            self._gates = None
+            if (latched == None) or ((latched ^ value) & 0x00ff):
+                self.hal._writeByte(ECalHalAbc._MUX_ADDR_GATES_1_8, value & 0x00ff)
+            if (latched == None) or ((latched ^ value) & 0xff00):
+                self.hal._writeByte(ECalHalAbc._MUX_ADDR_GATES_9_16, (value & 0xff00) >> 8)
+            self._gates = value
+
+    def switchTo(self, standard: ECalStandardAbc) -> None:
+        '''Selects the standard with as few bus writes as possible, returns once its gates are latched'''
+        self.setGates(standard.id)
 
     def isolate(self) -> None:
+        '''Opens all gates, always writing both gate bytes'''
+        self._gates = None
         self.setGates(0xffff)
 
+    @property
+    def gates(self) -> int:
+        '''Gate word last latched, None while unknown'''
+        return self._gates
+
+    def _forgetGates(self) -> None:
+        '''Gates were written around this object, the next setGates writes both bytes'''
+        self._gates = None
+
+    def _reset(self) -> None:
+        self._gates = None
+        self.hal._reset()
+        self._flashCache.invalidate()
+
     def _readCorrectionSets(self):
-        self._correctionSets.update({CorrectionSetScope.PORT_A, ECalCorrectionSet(self, ECalControl._EEPROM_ADDR_CORRSET1)})
-        self._correctionSets.update({CorrectionSetScope.PORT_B, ECalCorrectionSet(self, ECalControl._EEPROM_ADDR_CORRSET2)})
-        self._correctionSets.update({CorrectionSetScope.THRU_AB, ECalCorrectionSet(self, ECalControl._EEPROM_ADDR_CORRSET3)})
-        self._correctionSets.update({CorrectionSetScope.VERIFY_AB, ECalCorrectionSet(self, ECalControl._EEPROM_ADDR_CORRSET4)})
+        self._correctionSets.update({CorrectionSetScope.PORT_A: ECalCorrectionSet(self, ECalControl._EEPROM_ADDR_CORRSET1, CorrectionSetScope.PORT_A)})
+        self._correctionSets.update({CorrectionSetScope.PORT_B: ECalCorrectionSet(self, ECalControl._EEPROM_ADDR_CORRSET2, CorrectionSetScope.PORT_B)})
+        self._correctionSets.update({CorrectionSetScope.THRU_AB: ECalCorrectionSet(self, ECalControl._EEPROM_ADDR_CORRSET3, CorrectionSetScope.THRU_AB)})
+        self._correctionSets.update({CorrectionSetScope.VERIFY_AB: ECalCorrectionSet(self, ECalControl._EEPROM_ADDR_CORRSET4, CorrectionSetScope.VERIFY_AB)})
+
+    def readBytesFromFlash(self, addr, length) -> bytes:
+        if (self._snapshot != None) and self._snapshot.contains(addr, length):
+            return self._snapshot.read(addr, length)
+        return self._flashCache.read(addr, length)
 
     def readValueFromFlash(self, addr, format = "c"):
-        valueBytes = bytes()
         noBytesPerValue = struct.calcsize(format)
-
-        for j in range(noBytesPerValue):
-            valueBytes += bytes([self.hal._readByteFromFlash(addr + j)])
+        valueBytes = self.readBytesFromFlash(addr, noBytesPerValue)
         return struct.unpack(format, valueBytes)[0]
 
     def readStringFromFlash(self, addr, maxlen = 255):        
         readBytes = bytes()
-        for j in range(maxlen):
-            readInt = self.hal._readByteFromFlash(addr + j)
-            if readInt == 0: break
-            readBytes += bytes([readInt])
+        #read in bursts the HAL can serve in one round trip, stop at the terminating zero
+        while len(readBytes) < maxlen:
+            chunk = self.readBytesFromFlash(addr + len(readBytes), min(maxlen - len(readBytes), max(self.hal._MAX_BLOCK_LENGTH, self._flashCache.pageSize)))
+            end = chunk.find(0)
+            if end >= 0:
+                readBytes += chunk[:end]
+                break
+            readBytes += chunk
         try:
             return readBytes.decode()
         except:
             return ""
 
-    def readArrayFromFlash(self, addr, len, format = "i"):
-
-        valueList = []
-        noBytesPerValue = struct.calcsize(format)
-        for i in range(len):
-            valueList += self.readValueFromFlash(addr + i*noBytesPerValue, format)
-        return valueList
+    def readArrayFromFlash(self, addr, len, format = "i") -> np.ndarray:
+        dtype = np.dtype("<" + format)
+        return np.frombuffer(self.readBytesFromFlash(addr, len * dtype.itemsize), dtype=dtype)
     
 
+    def _ensureInfo(self):
+        if self._infoRead: return
+
+        fingerprint = None
+        #wrapped here so overrides in subclasses are attributed too
+        with self._operation("ECalControl._readECalInfo"):
+            if self._metadataCache != None:
+                fingerprint = ECalMetadataCache.fingerprint(self)
+                metadata = self._metadataCache.lookup(*fingerprint)
+                if metadata != None:
+                    self._applyMetadata(metadata)
+                    fingerprint = None
+                else:
+                    self._readECalInfo()
+            else:
+                self._readECalInfo()
+        self._infoRead = True
+
+        #unknown module or changed content, read the rest once for the next time
+        if fingerprint != None:
+            with self._operation("ECalControl._storeMetadata"):
+                self._metadataCache.store(*fingerprint, self._metadata())
+
+
+    def _metadata(self) -> dict:
+        self._ensureInfo()
+        return {"info": {"numPoints": self._numPoints,
+                         "warmupTime": self._warmupTime,
+                         "model": self._model,
+                         "serialNo": self._serialNo,
+                         "connectorType": self._connectorType,
+                         "lastCertification": self._lastCalibration,
+                         "numFrequencies": self._numFrequencies},
+                "correctionSets": {scope.name: correctionSet._metadata() for scope, correctionSet in self.correctionSets.items()},
+                "frequencyList": self.frequencyList.tolist()}
+
+    def _applyMetadata(self, metadata: dict) -> None:
+        info = metadata["info"]
+        self._numPoints = info["numPoints"]
+        self._warmupTime = info["warmupTime"]
+        self._model = info["model"]
+        self._serialNo = info["serialNo"]
+        self._connectorType = info["connectorType"]
+        self._lastCalibration = info["lastCertification"]
+        self._numFrequencies = info["numFrequencies"]
+        self._initPorts()
+
+        for scope, correctionSet in self.correctionSets.items():
+            correctionSet._applyMetadata(metadata["correctionSets"][scope.name])
+        self._frequencyList = np.array(metadata["frequencyList"], dtype=np.float64)
+
+    def loadHeaders(self) -> None:
+        '''Reads the info block, the correction set headers and their standards tables now rather than on first use'''
+        self._ensureInfo()
+        for correctionSet in self.correctionSets.values():
+            correctionSet.standards
+
     def _readECalInfo(self):
         self._numPoints = self.readValueFromFlash(ECalControl._EEPROM_ADDR_NOPOINTS,"H")
         self._warmupTime = self.readValueFromFlash(ECalControl._EEPROM_ADDR_WARMUP,"H")
@@ -93,44 +233,137 @@ class ECalControl(ECalControlAbc):
         self._connectorType = self.readStringFromFlash(ECalControl._EEPROM_ADDR_CONNTYPE, maxlen = 21)
         self._lastCalibration = self.readStringFromFlash(ECalControl._EEPROM_ADDR_LASTCERT, maxlen = 33)
         self._numFrequencies = self.readValueFromFlash(ECalControl._EEPROM_ADDR_FREQ_NO,"H")
+        self._initPorts()
 
-        tokens = re.split("([MF])",self.connectorType.split()[0])
+    def _initPorts(self):
+        tokens = re.split("([MF])",self._connectorType.split()[0])
+        self._ports = []
         self._ports.append(RfPort("Port A", tokens[0], ConnectorGender.MALE if tokens[1] == "M" else ConnectorGender.FEMALE, device=self))
         self._ports.append(RfPort("Port B", tokens[2], ConnectorGender.MALE if tokens[3] == "M" else ConnectorGender.FEMALE, device=self))
 
 
+    def _readPlanned(self, planner: ECalReadPlanner) -> ECalFlashSnapshot:
+        snapshot = planner.read()
+        self._snapshot = snapshot if self._snapshot == None else self._snapshot.merge(snapshot)
+        return snapshot
+
+    def fetchCorrectionSets(self, scopes: List[CorrectionSetScope] = None) -> dict[CorrectionSetScope, dict[int, any]]:
+        '''Fetches the data of all standards in the given correction sets (all by default), keyed by scope and standard id.
+        Whatever isn't known yet is read in three stages, each coalesced into as few sequential bursts as possible:
+        info block and correction set headers, then standards tables and frequency list, then the standards' data.'''
+        if scopes == None: scopes = list(CorrectionSetScope)
+
+        with self._operation("ECalControl.fetchCorrectionSets"):
+            try:
+                #info block and headers. Strings are read in full, per byte HALs rather read them up to their terminating zero later
+                planner = ECalReadPlanner(self.hal)
+                if not self._infoRead:
+                    if self._metadataCache != None:
+                        #fingerprint, a known module needs nothing else
+                        planner.add(*ECalControl._HEADER_REGION)
+                        if self.hal._MAX_BLOCK_LENGTH > 1: planner.add(ECalControl._EEPROM_ADDR_SERNO, 7)
+                    elif self.hal._MAX_BLOCK_LENGTH > 1:
+                        for addr, length in ECalControl._INFO_REGIONS: planner.add(addr, length)
+                    #frequency count and list address
+                    planner.add(ECalControl._EEPROM_ADDR_FREQ_NO, 6)
+                for scope in scopes:
+                    if not self.correctionSets[scope]._headerRead: planner.add(self.correctionSets[scope]._address, 14)
+                self._readPlanned(planner)
+                self._ensureInfo()
+                correctionSets = [self.correctionSets[scope] for scope in scopes]
+                for correctionSet in correctionSets: correctionSet._ensureHeader()
+
+                #standards tables and frequency list
+                planner = ECalReadPlanner(self.hal)
+                for correctionSet in correctionSets:
+                    if correctionSet._Standards == None: planner.add(correctionSet._standardsAddr, 2 * correctionSet._numStandards)
+                if len(self._frequencyList) == 0:
+                    planner.add(self.readValueFromFlash(ECalControl._EEPROM_ADDR_FREQ_ADDR,"I"), self.numFrequencies * 8)
+                self._readPlanned(planner)
+                for correctionSet in correctionSets: correctionSet.standards
+                self.frequencyList
+
+                #standards data
+                planner = ECalReadPlanner(self.hal)
+                for correctionSet in correctionSets:
+                    for std in correctionSet.standards: planner.add(std.dataAddrInEEPROM, std.dataLengthInEEPROM)
+                snapshot = self._readPlanned(planner)
+                return {correctionSet.scope: {std.id: std.fetchDataFromEEPROM(snapshot.read(std.dataAddrInEEPROM, std.dataLengthInEEPROM)) 
+                                              for std in correctionSet.standards}
+                        for correctionSet in correctionSets}
+            finally:
+                self._snapshot = None
+
+
+    def captureFlashImage(self, folder: Path = None) -> Path:
+        '''Dumps the whole flash into an image file named after the module's model and serial number.
+        Open it later with ECalHalImage.forModule to work with the module's data without the hardware.'''
+        if folder == None: folder = self.dataFolderPath
+        return ECalHalImage.captureImage(self.hal, folder.joinpath(ECalHalImage.imageFileName(self.model, self.serialNo)))
+
+
+    def downloadCharacterization(self, folder: Path = None, progress = None, **kwargs) -> dict[str, any]:
+        '''Downloads (or resumes downloading) the characterization data of all standards, see ECalDownloadJob'''
+        return ECalDownloadJob(self, folder, progress=progress, **kwargs).run()
+
+
+    def startWarmup(self, **kwargs) -> ECalWarmupScheduler:
+        '''Starts the warm-up timer and prepares the module in the background, see ECalWarmupScheduler'''
+        return ECalWarmupScheduler(self, **kwargs).start()
+
+
     @property
     def ports(self) -> List[RfPort]:
+        self._ensureInfo()
         return self._ports
 
     @property
     def port_A(self) -> RfPort:
-        try: return self._ports[0]
+        try: return self.ports[0]
         except: return None
 
     @property
     def port_B(self) -> RfPort:
-        try: return self._ports[1]
+        try: return self.ports[1]
         except: return None
 
     @property
     def model(self) -> str:
+        self._ensureInfo()
         return self._model
 
     @property
     def serialNo(self) -> str:
+        self._ensureInfo()
         return self._serialNo
 
     @property
     def connectorType(self) -> str:
+        self._ensureInfo()
         return self._connectorType
+
+    @property
+    def warmupTime(self) -> int:
+        '''Warm-up time in minutes stored in the module'''
+        self._ensureInfo()
+        return self._warmupTime
+
+    @property
+    def lastCertification(self) -> str:
+        self._ensureInfo()
+        return self._lastCalibration
     
     @property
     def numFrequencies(self) -> int:
+        self._ensureInfo()
         return self._numFrequencies
     
     @property
     def correctionSets(self) -> dict[CorrectionSetScope, ECalCorrectionSetAbc]:
+        if self._correctionSets == None:
+            #the set objects are cheap, their headers are read on first use
+            self._correctionSets = dict()
+            self._readCorrectionSets()
         return self._correctionSets
     
     @property
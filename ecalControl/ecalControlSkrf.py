@@ -1,12 +1,16 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 from .abstract import ECalHalAbc
 from .abstract import CorrectionSetScope
 from .ecalCorrectionSetSkrf import ECalCorrectionSetSk
 from .ecalControlBase import ECalControl
-from skrf import Frequency
+from .ecalStandardCache import ECalStandardCache, ECalStandardStore
+from skrf import Frequency, Network
 
 class ECalControlSk(ECalControl):
-    def __init__(self, hal: ECalHalAbc):
-        super().__init__(hal)
+    def __init__(self, hal: ECalHalAbc, **kwargs):
+        super().__init__(hal, **kwargs)
+        self._standardCache : ECalStandardCache = None
 
 
     def _readCorrectionSets(self):
@@ -18,8 +22,38 @@ class ECalControlSk(ECalControl):
     
     @property
     def correctionSets(self) -> dict[CorrectionSetScope, ECalCorrectionSetSk]:
-        return self._correctionSets
+        return super().correctionSets
     
     @property
     def frequency(self) -> Frequency:
-        return Frequency.from_f(self._frequencyList)
\ No newline at end of file
+        return Frequency.from_f(self.frequencyList)
+
+    @property
+    def standardCache(self) -> ECalStandardCache:
+        '''Binary cache of the standards' touchstone files in the data folder, shared by all users of the module in this process'''
+        if self._standardCache == None:
+            self._standardCache = ECalStandardStore.shared(self.dataFolderPath).cache(self.model, self.serialNo)
+        return self._standardCache
+
+    def prefetch(self, scopes: List[CorrectionSetScope] = None, maxWorkers: int = None) -> dict[CorrectionSetScope, dict[int, Network]]:
+        '''
+        Loads the networks of the standards in the given correction sets (all by default) now rather than on first use.
+        Headers are read from flash first, one set after another, then the standards' networks are built in parallel.
+        Returns {scope: {standard id: network}}, networks of standards without touchstone file are None.
+        '''
+        if scopes == None: scopes = list(CorrectionSetScope)
+        standards = [(scope, std) for scope in scopes for std in self.correctionSets[scope].standards]
+
+        #one read for all standards, before the threads share the cache
+        try:
+            self.standardCache.load()
+        except Exception:
+            pass
+
+        with ThreadPoolExecutor(max_workers=maxWorkers, thread_name_prefix="ECalPrefetch") as pool:
+            networks = list(pool.map(lambda entry: entry[1].network, standards))
+
+        result = {scope: dict() for scope in scopes}
+        for (scope, std), network in zip(standards, networks):
+            result[scope][std.id] = network
+        return result
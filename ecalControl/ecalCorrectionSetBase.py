@@ -11,19 +11,17 @@ class ECalCorrectionSet(ECalCorrectionSetAbc):
     '''
     Group of standards in the ECal
     E.g. Port1 standards, Port2 standards, Thru standard(s), Verify standard(s)
+    The header and the standards table are read from flash on first use
     '''
 
     def __init__(self, ecal: "ECalControlAbc" , address: int, scope: CorrectionSetScope) -> None:
 
         self._ecal = ecal
-        self._numStandards = ecal.readValueFromFlash(address, "H")
-        self._pointsPerStandard = ecal.readValueFromFlash(address + 2, "H")
-        self._paramsPerPoint = ecal.readValueFromFlash(address + 4, "H")
-        self._standardsAddr = ecal.readValueFromFlash(address + 6, "I")
-        self._dataAddr = ecal.readValueFromFlash(address + 10, "I")
+        self._address = address
         self._scope : CorrectionSetScope = scope
 
-        self._initStandards()
+        self._headerRead = False
+        self._Standards : dict[int, ECalStandardAbc] = None
 
         self._StandardsIterator = None
 
@@ -32,23 +30,76 @@ class ECalCorrectionSet(ECalCorrectionSetAbc):
         return self._ecal
 
     def __iter__(self):
-        self._StandardsIterator = iter(self._Standards)
+        self._StandardsIterator = iter(self._standards)
         return self
     
     def __next__(self) -> ECalStandardAbc:
         return self._Standards[next(self._StandardsIterator)]
     
     def __getitem__(self, standardId: int) -> ECalStandardAbc:
-        return self._Standards[standardId]
+        return self._standards[standardId]
+
+    def __len__(self) -> int:
+        return self.numStandards
+
+    def _readHeader(self):
+        self._numStandards = self._ecal.readValueFromFlash(self._address, "H")
+        self._pointsPerStandard = self._ecal.readValueFromFlash(self._address + 2, "H")
+        self._paramsPerPoint = self._ecal.readValueFromFlash(self._address + 4, "H")
+        self._standardsAddr = self._ecal.readValueFromFlash(self._address + 6, "I")
+        self._dataAddr = self._ecal.readValueFromFlash(self._address + 10, "I")
+        self._headerRead = True
+
+    def _ensureHeader(self):
+        if not self._headerRead:
+            with self._ecal._operation("ECalCorrectionSet._readHeader"):
+                self._readHeader()
+
+    @property
+    def _standards(self) -> dict[int, ECalStandardAbc]:
+        if self._Standards == None:
+            self._ensureHeader()
+            with self._ecal._operation("ECalCorrectionSet._initStandards"):
+                self._initStandards()
+        return self._Standards
+
+    @property
+    def standards(self) -> list[ECalStandardAbc]:
+        return list(self._standards.values())
     
-    def _initStandards(self):
+    def _readStandardIds(self) -> list[int]:
+        return [self._ecal.readValueFromFlash(self._standardsAddr + 2*i, "H") for i in range(self._numStandards)]
+
+    def _newStandard(self, id: int, index: int) -> ECalStandardAbc:
+        return ECalStandard(self, id, index)
+
+    def _initStandards(self, standardIds: list[int] = None):
+        if standardIds == None: standardIds = self._readStandardIds()
         self._Standards = dict()
-        for i in range(self._numStandards):
-            id = self._ecal.readValueFromFlash(self._standardsAddr + 2*i, "H")
-            self._Standards.update({id : ECalStandard(self, id)})
+        for i, id in enumerate(standardIds):
+            self._Standards.update({id : self._newStandard(id, i)})
+
+
+    def _metadata(self) -> dict:
+        '''Parsed header and standard ids, for the metadata cache'''
+        standardIds = list(self._standards)
+        return {"header": [self._numStandards, self._pointsPerStandard, self._paramsPerPoint, self._standardsAddr, self._dataAddr],
+                "standardIds": standardIds}
+
+    def _applyMetadata(self, metadata: dict):
+        self._numStandards, self._pointsPerStandard, self._paramsPerPoint, self._standardsAddr, self._dataAddr = metadata["header"]
+        self._headerRead = True
+        #standards already handed out (read from flash before the info was needed) stay the set's standards
+        if self._Standards == None: self._initStandards(metadata["standardIds"])
     
+    @property
+    def numStandards(self) -> int:
+        self._ensureHeader()
+        return self._numStandards
+
     @property
     def paramsPerPointPerStandard(self) -> int:
+        self._ensureHeader()
         return int(self._paramsPerPoint / self._numStandards)
             
     @property
@@ -59,6 +110,7 @@ class ECalCorrectionSet(ECalCorrectionSetAbc):
 
     @property
     def dataAddrInEEPROM(self) -> int:
+        self._ensureHeader()
         return self._dataAddr
 
     @property
@@ -67,4 +119,5 @@ class ECalCorrectionSet(ECalCorrectionSetAbc):
     
     @property
     def paramsPerPoint(self) -> int:
+        self._ensureHeader()
         return self._paramsPerPoint
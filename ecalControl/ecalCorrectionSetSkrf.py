@@ -1,5 +1,5 @@
-
 import math
+import numpy as np
 
 from .abstract import ECalControlAbc
 from .abstract import CorrectionSetScope
@@ -11,12 +11,55 @@ class ECalCorrectionSetSk (ECalCorrectionSet):
     Group of standards in the ECal
     E.g. Port1 standards, Port2 standards, Thru standard(s), Verify standard(s)
     Initialized standards to skrf derived class
+    Also exposes the whole set's data as one stacked array for vectorized use
     '''
     def __init__(self, ecal: ECalControlAbc, address: int, scope: CorrectionSetScope) -> None:
         super().__init__(ecal, address, scope)
+        #(standards, frequencies, ports, ports) array and its frequencies, built on first use
+        self._stacked : np.ndarray = None
+        self._stackedFrequencies : np.ndarray = None
+
+    def _newStandard(self, id: int, index: int) -> ECalStandardSk:
+        return ECalStandardSk(self, id, index)  
+
+
+    def _stack(self) -> None:
+        standards : list[ECalStandardSk] = self.standards
+        data = [std.sParameters for std in standards]
+        if any(s is None for s in data):
+            raise LookupError(f"No characterization data for some standards of {self._scope.name}, download it or fetch it from the EEPROM first.")
+
+        frequencies = [std.frequencies for std in standards]
+        if not all(np.array_equal(f, frequencies[0]) for f in frequencies):
+            raise ValueError(f"Standards of {self._scope.name} aren't on a common frequency grid.")
+
+        self._stacked = np.stack(data).astype(np.complex64, copy=False)
+        self._stacked.flags.writeable = False
+        self._stackedFrequencies = np.asarray(frequencies[0])
+
+    def _invalidateStacked(self) -> None:
+        self._stacked = None
+        self._stackedFrequencies = None
+
+    @property
+    def sParameters(self) -> np.ndarray:
+        '''Read-only complex64 array of shape (standards, frequencies, ports, ports), standards in the order of ids.
+        Comes straight from the standard cache without building Networks where the touchstone files are available.'''
+        if self._stacked is None: self._stack()
+        return self._stacked
+
+    @property
+    def frequencies(self) -> np.ndarray:
+        '''Frequencies in Hz of sParameters'''
+        if self._stacked is None: self._stack()
+        return self._stackedFrequencies
+
+    @property
+    def ids(self) -> np.ndarray:
+        return np.array(list(self._standards), dtype=np.uint16)
 
-    def _initStandards(self):
-        self._Standards = dict()
-        for i in range(self._numStandards):
-            id = self._ecal.readValueFromFlash(self._standardsAddr + 2*i, "H")
-            self._Standards.update({id : ECalStandardSk(self, id, i)})  
\ No newline at end of file
+    @property
+    def gates(self) -> np.ndarray:
+        '''Gate words selecting the standards, in the order of ids'''
+        #a standard's id is the gate word it's switched in with
+        return np.array([std.id for std in self.standards], dtype=np.uint16)
@@ -0,0 +1,146 @@
+import json
+import threading
+from pathlib import Path
+
+from .abstract import ECalHalAbc
+from .abstract import ECalControlAbc
+
+
+class ECalDeviceRegistry():
+    '''
+    Remembers which ECal module (by serial number) sits behind which control adapter, across runs.
+    scan() enumerates FT2232 port pairs and Arduino serial ports, opens each and reads the module's serial number.
+    open(serialNo) goes straight to the remembered adapter, checks the serial number (a handful of flash bytes)
+    and only rescans if the module moved.
+    '''
+
+    _SERIAL_MAXLEN = 7
+
+    def __init__(self, filePath: Path = None, caminoVids: list[int] = None) -> None:
+        if filePath == None:
+            filePath = Path(__file__).parent.resolve().joinpath("data", "ecalDevices.json")
+        self._filePath = Path(filePath)
+        self._caminoVids = caminoVids
+        self._lock = threading.Lock()
+        self._devices : dict[str, dict] = self._load()
+
+
+    @property
+    def devices(self) -> dict[str, dict]:
+        '''Known modules: serial number -> adapter ("ftdi" or "camino") and how to find it'''
+        return dict(self._devices)
+
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            with open(self._filePath, "r") as f:
+                return json.load(f)
+        except:
+            return {}
+
+    def _save(self) -> None:
+        tempPath = self._filePath.with_suffix(".tmp")
+        with open(tempPath, "w") as f:
+            json.dump(self._devices, f, indent=4)
+        tempPath.replace(self._filePath)
+
+
+    def readSerialNo(hal: ECalHalAbc) -> str:
+        '''Serial number of the module behind the HAL, read straight from flash'''
+        raw = hal._readBlockFromFlash(ECalControlAbc._EEPROM_ADDR_SERNO, ECalDeviceRegistry._SERIAL_MAXLEN)
+        try:
+            return raw.split(bytes(1))[0].decode()
+        except:
+            return ""
+
+
+    def scan(self) -> dict[str, dict]:
+        '''Enumerates all adapters, identifies the modules behind them and replaces the remembered mapping'''
+        devices = dict()
+        for entry, hal in self._enumerate():
+            try:
+                serialNo = ECalDeviceRegistry.readSerialNo(hal)
+                if serialNo != "": devices[serialNo] = entry
+            except:
+                pass
+            finally:
+                hal.close()
+
+        with self._lock:
+            self._devices = devices
+            self._save()
+        return dict(devices)
+
+
+    def open(self, serialNo: str, rescan: bool = True) -> ECalHalAbc:
+        '''Opened HAL of the module with the given serial number'''
+        entry = self._devices.get(serialNo)
+        if entry != None:
+            hal = self._openEntry(entry)
+            if hal != None:
+                try:
+                    if ECalDeviceRegistry.readSerialNo(hal) == serialNo: return hal
+                except:
+                    pass
+                hal.close()
+
+        if rescan:
+            self.scan()
+            return self.open(serialNo, rescan=False)
+        raise LookupError(f"ECal s/n {serialNo} not found.")
+
+    def forget(self, serialNo: str) -> None:
+        with self._lock:
+            if self._devices.pop(serialNo, None) != None: self._save()
+
+
+    def _enumerate(self):
+        '''Yields (registry entry, opened HAL) for every adapter found'''
+        try:
+            from .ecalHalFtdi import ECalHalFtdi
+            for pair in ECalHalFtdi.getValidFT2232PortPairs():
+                try:
+                    hal = ECalHalFtdi(pair)
+                except:
+                    continue
+                yield {"hal": "ftdi", "serial": hal.serial, "ports": [pair[0]["serial"].decode(), pair[1]["serial"].decode()]}, hal
+        except (ImportError, OSError):
+            pass
+
+        try:
+            from .ecalHalCamino import ECalHalCamino
+            for port in ECalHalCamino.getSerialPorts(self._caminoVids):
+                try:
+                    hal = ECalHalCamino(port.device)
+                except:
+                    continue
+                yield {"hal": "camino", "device": port.device, "usbSerial": port.serial_number}, hal
+        except (ImportError, OSError):
+            pass
+
+
+    def _openEntry(self, entry: dict) -> ECalHalAbc | None:
+        '''Opens the remembered adapter, None if it's gone'''
+        try:
+            if entry["hal"] == "ftdi":
+                from .ecalHalFtdi import ECalHalFtdi
+                #open the remembered ports directly, enumerating the devices only if that fails
+                if entry.get("ports") != None:
+                    try:
+                        return ECalHalFtdi(({"serial": entry["ports"][0].encode()}, {"serial": entry["ports"][1].encode()}))
+                    except:
+                        pass
+                for pair in ECalHalFtdi.getValidFT2232PortPairs():
+                    if pair[0]["serial"].decode()[:-1] == entry["serial"]: return ECalHalFtdi(pair)
+
+            elif entry["hal"] == "camino":
+                from .ecalHalCamino import ECalHalCamino
+                #the USB serial number survives the port being renamed
+                device = entry["device"]
+                if entry.get("usbSerial") != None:
+                    for port in ECalHalCamino.getSerialPorts(self._caminoVids):
+                        if port.serial_number == entry["usbSerial"]: device = port.device
+                return ECalHalCamino(device)
+        except:
+            pass
+        return None
@@ -0,0 +1,296 @@
+import json
+import os
+import time
+import zlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List
+
+from .abstract import ECalHalAbc
+from .abstract import ECalControlAbc
+from .abstract import ECalStandardAbc
+from .abstract import CorrectionSetScope
+
+
+@dataclass(frozen=True)
+class ECalDownloadProgress:
+    serialNo: str
+    standard: str
+    bytesDone: int
+    bytesTotal: int
+    bytesPerSecond: float
+    eta: float
+
+    def __str__(self) -> str:
+        percent = 100 * self.bytesDone / self.bytesTotal if self.bytesTotal > 0 else 100
+        return f"{self.serialNo} {self.standard}: {self.bytesDone}/{self.bytesTotal} bytes ({percent:.1f}%), {self.bytesPerSecond:.0f} Byte/s, ETA {self.eta:.0f}s"
+
+
+class ECalDownloadJob():
+    '''
+    Downloads the characterization data of the module's standards in chunks.
+    Every chunk read is written to a sparse data file at its flash address and recorded, with its CRC32, in a sidecar file.
+    A restarted job re-checks the recorded chunks and continues from the last verified offset of each standard.
+    Completed standards are decoded and, for scikit-rf standards, saved as touchstone files.
+    The data and sidecar files are removed once every standard was saved, otherwise they are kept for the next run.
+    '''
+
+    def __init__(self,
+                 ecal: ECalControlAbc,
+                 folder: Path = None,
+                 chunkLength: int = 1024,
+                 scopes: List[CorrectionSetScope] = None,
+                 progress: Callable[[ECalDownloadProgress], None] = None,
+                 saveTouchstone: bool = True) -> None:
+
+        self._ecal = ecal
+        self._folder = Path(folder) if folder != None else ecal.dataFolderPath
+        self._chunkLength = chunkLength
+        self._scopes = scopes if scopes != None else list(ecal.correctionSets)
+        self._progress = progress
+        self._saveTouchstone = saveTouchstone
+
+        baseName = "ECal " + ecal.model + " s_n " + ecal.serialNo + " download"
+        self._dataPath = self._folder.joinpath(baseName + ".bin")
+        self._sidecarPath = self._folder.joinpath(baseName + ".json")
+
+        self._standards : dict[str, ECalStandardAbc] = dict()
+        for scope in self._scopes:
+            for std in ecal.correctionSets[scope]:
+                self._standards[ECalDownloadJob.standardKey(scope, std.id)] = std
+
+        self._state : dict = None
+        self._bytesThisRun = 0
+        self._startTime = 0.0
+
+
+    def standardKey(scope: CorrectionSetScope, id: int) -> str:
+        return scope.name + " 0x{0:04x}".format(id)
+
+
+    @property
+    def bytesTotal(self) -> int:
+        return sum(std.dataLengthInEEPROM for std in self._standards.values())
+
+    @property
+    def bytesDone(self) -> int:
+        if self._state == None: return 0
+        return sum(entry["verified"] for entry in self._state["standards"].values())
+
+    @property
+    def isComplete(self) -> bool:
+        return self.bytesDone == self.bytesTotal
+
+
+    def run(self) -> dict[str, any]:
+        '''Returns the decoded data of all standards, keyed by standardKey'''
+        self._loadState()
+        self._bytesThisRun = 0
+        self._startTime = time.perf_counter()
+        decoded = dict()
+
+        mode = "r+b" if self._dataPath.exists() else "w+b"
+        with open(self._dataPath, mode) as dataFile:
+            self._verifyRecordedChunks(dataFile)
+
+            for key, std in self._standards.items():
+                entry = self._state["standards"][key]
+                while entry["verified"] < entry["length"]:
+                    offset = entry["verified"]
+                    length = min(self._chunkLength, entry["length"] - offset)
+                    chunk = self._ecal.hal._readBlockFromFlash(entry["addr"] + offset, length)
+
+                    dataFile.seek(entry["addr"] + offset)
+                    dataFile.write(chunk)
+                    dataFile.flush()
+                    os.fsync(dataFile.fileno())
+
+                    entry["crc"].append(zlib.crc32(chunk))
+                    entry["verified"] = offset + length
+                    self._saveState()
+
+                    self._bytesThisRun += length
+                    self._reportProgress(key)
+
+                #standards completed by an earlier run are decoded again from the data file
+                dataFile.seek(entry["addr"])
+                decoded[key] = std.fetchDataFromEEPROM(dataFile.read(entry["length"]))
+                if not entry["saved"]: entry["saved"] = self._saveStandard(std)
+                entry["complete"] = True
+                self._saveState()
+
+        #the data file is the only copy of standards that weren't saved elsewhere
+        if all(entry["saved"] for entry in self._state["standards"].values()): self.discard()
+        return decoded
+
+
+    def discard(self) -> None:
+        '''Removes the data and sidecar files, the next run starts from scratch'''
+        self._dataPath.unlink(missing_ok=True)
+        self._sidecarPath.unlink(missing_ok=True)
+
+
+    def _saveStandard(self, std: ECalStandardAbc) -> bool:
+        '''Saves a decoded standard as touchstone file, returns whether it was saved'''
+        if self._saveTouchstone & hasattr(std, "saveDataToTouchstoneFile"):
+            std.saveDataToTouchstoneFile()
+            return True
+        return False
+
+
+    def _newState(self) -> dict:
+        return {"model": self._ecal.model,
+                "serialNo": self._ecal.serialNo,
+                "chunkLength": self._chunkLength,
+                "standards": {key: {"addr": std.dataAddrInEEPROM, "length": std.dataLengthInEEPROM, "verified": 0, "crc": [], "complete": False, "saved": False}
+                              for key, std in self._standards.items()}}
+
+    def _loadState(self) -> None:
+        fresh = self._newState()
+        try:
+            with open(self._sidecarPath, "r") as f:
+                state = json.load(f)
+        except:
+            state = None
+
+        #start over if the sidecar belongs to a different module, chunking or layout
+        if (state == None) or (state["model"] != fresh["model"]) or (state["serialNo"] != fresh["serialNo"]) or (state["chunkLength"] != fresh["chunkLength"]):
+            self._dataPath.unlink(missing_ok=True)
+            self._state = fresh
+            return
+
+        for key, entry in fresh["standards"].items():
+            recorded = state["standards"].get(key)
+            if (recorded != None) and (recorded["addr"] == entry["addr"]) and (recorded["length"] == entry["length"]):
+                entry.update(recorded)
+        self._state = fresh
+
+    def _saveState(self) -> None:
+        tempPath = self._sidecarPath.with_suffix(".tmp")
+        with open(tempPath, "w") as f:
+            json.dump(self._state, f)
+        tempPath.replace(self._sidecarPath)
+
+
+    def _verifyRecordedChunks(self, dataFile) -> None:
+        '''Rolls each standard back to the last chunk whose data on disk still matches its recorded CRC'''
+        for entry in self._state["standards"].values():
+            verified = 0
+            goodChunks = 0
+            for crc in entry["crc"]:
+                length = min(self._chunkLength, entry["length"] - verified)
+                dataFile.seek(entry["addr"] + verified)
+                if zlib.crc32(dataFile.read(length)) != crc: break
+                verified += length
+                goodChunks += 1
+
+            if (goodChunks < len(entry["crc"])) | (verified != entry["verified"]):
+                entry["crc"] = entry["crc"][:goodChunks]
+                entry["verified"] = verified
+                entry["complete"] = False
+
+
+    def _reportProgress(self, key: str) -> None:
+        if self._progress == None: return
+
+        elapsed = time.perf_counter() - self._startTime
+        rate = self._bytesThisRun / elapsed if elapsed > 0 else 0.0
+        remaining = self.bytesTotal - self.bytesDone
+        eta = remaining / rate if rate > 0 else float("inf")
+
+        self._progress(ECalDownloadProgress(self._ecal.serialNo, key, self.bytesDone, self.bytesTotal, rate, eta))
+
+
+
+@dataclass(frozen=True)
+class ECalDownloadResult:
+    serialNo: str
+    bytesDownloaded: int
+    seconds: float
+    error: Exception = None
+
+    def __str__(self) -> str:
+        if self.error != None:
+            return f"{self.serialNo}: failed after {self.seconds:.1f}s - {self.error}"
+        rate = self.bytesDownloaded / self.seconds if self.seconds > 0 else 0.0
+        return f"{self.serialNo}: {self.bytesDownloaded} bytes in {self.seconds:.1f}s ({rate:.0f} Byte/s)"
+
+
+@dataclass(frozen=True)
+class ECalDownloadSummary:
+    results: List[ECalDownloadResult]
+    seconds: float
+
+    @property
+    def succeeded(self) -> bool:
+        return all(result.error == None for result in self.results)
+
+    @property
+    def bytesDownloaded(self) -> int:
+        return sum(result.bytesDownloaded for result in self.results)
+
+    def __str__(self) -> str:
+        lines = [str(result) for result in self.results]
+        lines.append(f"Total: {self.bytesDownloaded} bytes from {len(self.results)} module(s) in {self.seconds:.1f}s")
+        return "\n".join(lines)
+
+
+class ECalDownloadOrchestrator():
+    '''
+    Runs one ECalDownloadJob per ECal module, each in its own worker thread.
+    The HALs are I/O bound, so the total time is that of the slowest module rather than the sum.
+    Modules can be given as ECal control objects or as HALs, the latter opened with ecalFactory inside the worker.
+    '''
+
+    def __init__(self,
+                 modules: List[ECalControlAbc | ECalHalAbc],
+                 ecalFactory: Callable[[ECalHalAbc], ECalControlAbc] = None,
+                 progress: Callable[[ECalDownloadProgress], None] = None,
+                 **jobKwargs) -> None:
+
+        self._modules = modules
+        self._ecalFactory = ecalFactory
+        self._progressCallback = progress
+        self._jobKwargs = jobKwargs
+
+        self._lock = threading.Lock()
+        self._progress : dict[str, ECalDownloadProgress] = dict()
+
+
+    @property
+    def progress(self) -> dict[str, ECalDownloadProgress]:
+        '''Latest progress per module serial number'''
+        with self._lock:
+            return dict(self._progress)
+
+
+    def run(self) -> ECalDownloadSummary:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(len(self._modules), 1), thread_name_prefix="ECalDownload") as pool:
+            results = list(pool.map(self._download, self._modules))
+        return ECalDownloadSummary(results, time.perf_counter() - start)
+
+
+    def _download(self, module: ECalControlAbc | ECalHalAbc) -> ECalDownloadResult:
+        start = time.perf_counter()
+        serialNo = type(module).__name__
+        job = None
+        try:
+            if isinstance(module, ECalHalAbc):
+                if self._ecalFactory == None: raise ValueError("An ecalFactory is needed to open modules given as HALs.")
+                module = self._ecalFactory(module)
+            serialNo = module.serialNo
+
+            job = ECalDownloadJob(module, progress=self._reportProgress, **self._jobKwargs)
+            job.run()
+            return ECalDownloadResult(serialNo, job._bytesThisRun, time.perf_counter() - start)
+        except Exception as e:
+            return ECalDownloadResult(serialNo, job._bytesThisRun if job != None else 0, time.perf_counter() - start, e)
+
+
+    def _reportProgress(self, progress: ECalDownloadProgress) -> None:
+        with self._lock:
+            self._progress[progress.serialNo] = progress
+            if self._progressCallback != None: self._progressCallback(progress)
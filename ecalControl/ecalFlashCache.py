@@ -0,0 +1,106 @@
+from collections import OrderedDict
+from typing import Callable
+
+
+class ECalFlashCache():
+    '''
+    Page granular cache in front of a HAL's flash block reads.
+    Misses are fetched as contiguous bursts, extended by read-ahead pages when access is sequential.
+    Least recently used pages are evicted beyond maxPages.
+    '''
+
+    def __init__(self, 
+                 readBlock: Callable[[int, int], bytes], 
+                 flashSize: int, 
+                 pageSize: int = 256, 
+                 maxPages: int = 256, 
+                 readAheadPages: int = 2) -> None:
+        
+        if pageSize < 1: raise ValueError("Page size must be at least 1 byte.")
+
+        self._readBlock = readBlock
+        self._flashSize = flashSize
+        self._pageSize = pageSize
+        self._maxPages = max(maxPages, 1)
+        self._readAheadPages = readAheadPages
+
+        self._pages : OrderedDict[int, bytes] = OrderedDict()
+        self._lastMissedPage = None
+
+        self.hits = 0
+        self.misses = 0
+
+
+    @property
+    def pageSize(self) -> int:
+        return self._pageSize
+
+
+    def invalidate(self) -> None:
+        self._pages.clear()
+        self._lastMissedPage = None
+
+
+    def read(self, addr: int, length: int) -> bytes:
+        if length <= 0: return bytes()
+
+        firstPage = addr // self._pageSize
+        lastPage = (addr + length - 1) // self._pageSize
+
+        #reads larger than the cache would only flush it, serve them directly
+        if lastPage - firstPage + 1 > self._maxPages // 2:
+            return self._readBlock(addr, length)
+
+        self._fetchMissing(firstPage, lastPage)
+
+        data = bytearray()
+        for page in range(firstPage, lastPage + 1):
+            if page not in self._pages: self._fetchRun(page, page)
+            self._pages.move_to_end(page)
+            data += self._pages[page]
+
+        offset = addr - firstPage * self._pageSize
+        return bytes(data[offset:offset + length])
+
+
+    def prefetch(self, addr: int, length: int) -> None:
+        '''Loads the pages covering the range without reading ahead'''
+        if length <= 0: return
+        self._fetchMissing(addr // self._pageSize, (addr + length - 1) // self._pageSize, readAhead=False)
+
+
+    def _fetchMissing(self, firstPage: int, lastPage: int, readAhead: bool = True) -> None:
+        runs : list[list[int]] = []
+        for page in range(firstPage, lastPage + 1):
+            if page in self._pages:
+                self.hits += 1
+                self._pages.move_to_end(page)
+            else:
+                self.misses += 1
+                if (len(runs) > 0) and (runs[-1][1] == page - 1): runs[-1][1] = page
+                else: runs.append([page, page])
+
+        for runStart, runEnd in runs:
+            #sequential access, read the next few pages in the same burst
+            if readAhead and (runEnd == lastPage) and (self._lastMissedPage == runStart - 1):
+                runEnd = self._extendRun(runEnd)
+            self._fetchRun(runStart, runEnd)
+            self._lastMissedPage = runEnd
+
+
+    def _extendRun(self, runEnd: int) -> int:
+        lastFlashPage = (self._flashSize - 1) // self._pageSize
+        for i in range(self._readAheadPages):
+            if (runEnd + 1 > lastFlashPage) or (runEnd + 1 in self._pages): break
+            runEnd += 1
+        return runEnd
+
+
+    def _fetchRun(self, runStart: int, runEnd: int) -> None:
+        addr = runStart * self._pageSize
+        block = self._readBlock(addr, min((runEnd - runStart + 1) * self._pageSize, self._flashSize - addr))
+        for page in range(runStart, runEnd + 1):
+            offset = (page - runStart) * self._pageSize
+            self._pages[page] = block[offset:offset + self._pageSize]
+        while len(self._pages) > self._maxPages:
+            self._pages.popitem(last=False)
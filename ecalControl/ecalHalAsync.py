@@ -0,0 +1,72 @@
+import asyncio
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import AsyncIterator, Callable
+
+from .abstract import ECalHalAbc
+from .abstract import ECalHalAsyncAbc
+
+
+class ECalHalAsync(ECalHalAsyncAbc):
+    '''
+    Async HAL running a blocking HAL's calls on a single worker thread, so they are serialized 
+    and the event loop stays free while they wait on USB or serial I/O.
+    Used as is for the FTDI HAL.
+    '''
+
+    def __init__(self, hal: ECalHalAbc, executor: Executor = None) -> None:
+        self._hal = hal
+        self._ownsExecutor = executor == None
+        self._executor = executor if executor != None else ThreadPoolExecutor(max_workers=1, thread_name_prefix="ECalHal")
+        #called on the worker thread when gates are about to be written directly, so gate tracking elsewhere resynchronizes
+        self._gatesListeners : list[Callable[[], None]] = []
+
+
+    @property
+    def hal(self) -> ECalHalAbc:
+        return self._hal
+
+
+    def addGatesListener(self, listener: Callable[[], None]) -> None:
+        self._gatesListeners.append(listener)
+
+    def _gatesWritten(self) -> None:
+        for listener in self._gatesListeners: listener()
+
+
+    async def run(self, func: Callable, *args) -> any:
+        '''Runs any blocking call touching the HAL on the HAL's worker thread'''
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+
+    async def readBlock(self, addr: int, length: int) -> bytes:
+        return await self.run(self._hal._readBlockFromFlash, addr, length)
+
+    async def writeByte(self, addr: int, value: int) -> None:
+        def writeByte():
+            if addr in (ECalHalAbc._MUX_ADDR_GATES_1_8, ECalHalAbc._MUX_ADDR_GATES_9_16): self._gatesWritten()
+            self._hal._writeByte(addr, value)
+        await self.run(writeByte)
+
+    async def setGates(self, value: int) -> None:
+        def setGates():
+            self._gatesWritten()
+            self._hal._writeByte(ECalHalAbc._MUX_ADDR_GATES_1_8, value & 0x00ff)
+            self._hal._writeByte(ECalHalAbc._MUX_ADDR_GATES_9_16, (value & 0xff00) >> 8)
+        await self.run(setGates)
+
+
+    async def streamBlocks(self, addr: int, length: int) -> AsyncIterator[tuple[int, bytes]]:
+        blocks = self._hal._streamBlocksFromFlash(addr, length)
+        try:
+            while True:
+                block = await self.run(next, blocks, None)
+                if block == None: break
+                yield block
+        finally:
+            await self.run(blocks.close)
+
+
+    def close(self) -> None:
+        if self._ownsExecutor: self._executor.shutdown(wait=True)
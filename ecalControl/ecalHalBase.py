@@ -1,3 +1,5 @@
+from typing import Iterator
+
 from . import ECalHalAbc
 
 
@@ -11,6 +13,26 @@ class ECalHal(ECalHalAbc):
         pass
 
 
+    def _reset(self) -> None:
+        pass
+
+
+    def close(self) -> None:
+        pass
+
+
     def _readByteFromFlash(self, addr: int) -> int:
         return 0
 
+
+    def _readBlockFromFlash(self, addr: int, length: int) -> bytes:
+        '''Per byte fallback for HALs that can't do burst reads'''
+        return bytes([self._readByteFromFlash(addr + i) for i in range(length)])
+
+
+    def _streamBlocksFromFlash(self, addr: int, length: int) -> Iterator[tuple[int, bytes]]:
+        '''Yields (address, bytes) chunks covering the given flash range in order'''
+        #whole round trips of about 256 bytes
+        blockLength = self._MAX_BLOCK_LENGTH * max(1, 256 // self._MAX_BLOCK_LENGTH)
+        for blockAddr in range(addr, addr + length, blockLength):
+            yield blockAddr, self._readBlockFromFlash(blockAddr, min(blockLength, addr + length - blockAddr))
@@ -1,8 +1,13 @@
 import camino
 import time
-from typing import List
+import serial.tools.list_ports
+from serial.tools.list_ports_common import ListPortInfo
+import binascii
+from typing import List, Iterator
+from concurrent.futures import Executor
 
 from .ecalHalBase import ECalHal
+from .ecalHalAsync import ECalHalAsync
 
 class TypedArduino(camino.Arduino):
     def __init__(self, serial, address=0):
@@ -20,14 +25,40 @@ class TypedArduino(camino.Arduino):
         b = self.readNextByteFromFlash(out=bytes)
         i = int.from_bytes(b, byteorder="little", signed=False)
         return i
+
+    def readBlockFromFlashT(self, address: int, length: int) -> bytes:
+        b = self.readBlockFromFlash(list(address.to_bytes(3,byteorder='little',signed=False)) + [length], out=bytes)
+        if len(b) != length: raise camino.CaminoException(f"Expected {length} bytes from flash, got {len(b)}")
+        return b
     
     def writeByteT(self, address: int, value: int) -> None:
         return self.writeByte(address, value)
+
+    def streamFlashT(self, address: int, length: int, chunkLength: int) -> None:
+        return self.streamFlash(list(address.to_bytes(3,byteorder='little',signed=False)) + list(length.to_bytes(3,byteorder='little',signed=False)) + [chunkLength])
+
+    def setBaudRateT(self, baud: int) -> None:
+        return self.setBaudRate(list(baud.to_bytes(4,byteorder='little',signed=False)))
+
+    def confirmBaudRateT(self) -> None:
+        return self.confirmBaudRate()
     
     
 
 class ECalHalCamino(ECalHal):
 
+    _MAX_BLOCK_LENGTH = camino.MAX_DATA_LENGTH
+
+    #must match the Arduino sketch
+    _DEFAULT_BAUD = 115200
+    _BAUD_CONFIRM_TIMEOUT = 4.0
+    _STREAM_SYNC = bytes([0x5A, 0xA5])
+    _STREAM_CHUNK_LENGTH = 250
+    _STREAM_ATTEMPTS = 3
+
+    #tried from the top when negotiating the streaming baud rate
+    _STREAM_BAUD_RATES = [1000000, 500000, 250000, 230400, 115200]
+
     def __init__(self, serialPort: str, baud: int=115200):
 
         self._connection = None
@@ -42,24 +73,229 @@ class ECalHalCamino(ECalHal):
             self._arduino = None
             raise e
         
-        self._last_eeprom_address = 0xffff
+        #None while the firmware's address pointer isn't known
+        self._last_eeprom_address = None
+        #firmware without the block read callable falls back to per byte reads
+        self._hasBlockRead = hasattr(self._arduino, "readBlockFromFlash")
+        if not self._hasBlockRead: self._MAX_BLOCK_LENGTH = 1
+        self._hasStream = hasattr(self._arduino, "streamFlash") and hasattr(self._arduino, "setBaudRate")
+        self._streamBaud = None
         self._arduino.resetECalT()
             
 
     def __del__(self) -> None:
         pass
 
+    def close(self) -> None:
+        if self._connection != None: self._connection.port.close()
+        self._connection = None
+        self._arduino = None
+
+    @property
+    def serialPort(self) -> str:
+        return self._connection.port.port
+
+
+    #Arduino's USB vendor id
+    _ARDUINO_VIDS = [0x2341]
+
+    def getSerialPorts(vids: List[int] = None) -> List[ListPortInfo]:
+        '''Serial ports of USB devices with the given vendor ids, Arduino boards by default'''
+        if vids == None: vids = ECalHalCamino._ARDUINO_VIDS
+        return [port for port in serial.tools.list_ports.comports() if port.vid in vids]
+
     def _reset(self):
+        if self._instrumentation != None: self._instrumentation.count("packet")
         self._arduino.resetECalT()
         
     def _writeByte(self,addr: int, value: int) -> None:
+        if self._instrumentation != None: 
+            self._instrumentation.count("writeByte")
+            self._instrumentation.count("packet")
         self._arduino.writeByteT(addr,value)
 
     def _readByteFromFlash(self, addr) -> int:
-        if addr == self._last_eeprom_address + 1:
+        if self._instrumentation != None: 
+            self._instrumentation.count("flashBytes")
+            self._instrumentation.count("packet")
+        if (self._last_eeprom_address != None) and (addr == self._last_eeprom_address + 1):
             self._last_eeprom_address += 1
             return self._arduino.readNextByteFromFlashT()
         else:
             self._last_eeprom_address = addr
             return self._arduino.readByteFromFlashT(addr)
-        
+
+
+    def _readBlockFromFlash(self, addr: int, length: int) -> bytes:
+        if not self._hasBlockRead:
+            return super()._readBlockFromFlash(addr, length)
+
+        block = bytes()
+        while len(block) < length:
+            chunkLength = min(length - len(block), self._MAX_BLOCK_LENGTH)
+            block += self._arduino.readBlockFromFlashT(addr + len(block), chunkLength)
+            if self._instrumentation != None: 
+                self._instrumentation.count("flashBytes", chunkLength)
+                self._instrumentation.count("packet")
+        if length > 0: self._last_eeprom_address = addr + length - 1
+        return block
+
+
+    def _streamBlocksFromFlash(self, addr: int, length: int) -> Iterator[tuple[int, bytes]]:
+        '''Requests the range once and yields (address, bytes) chunks as the firmware streams them.
+        Chunks failing the checksum are requested again after the stream ends.'''
+        if not self._hasStream:
+            yield from super()._streamBlocksFromFlash(addr, length)
+            return
+
+        if self._streamBaud == None:
+            self._streamBaud = self._negotiateBaudRate(ECalHalCamino._STREAM_BAUD_RATES)
+        elif self._streamBaud != ECalHalCamino._DEFAULT_BAUD:
+            if not self._switchBaudRate(self._streamBaud): self._streamBaud = ECalHalCamino._DEFAULT_BAUD
+
+        try:
+            pending = [(addr, length)]
+            for attempt in range(ECalHalCamino._STREAM_ATTEMPTS):
+                failed = []
+                for rangeAddr, rangeLength in pending:
+                    yield from self._receiveStream(rangeAddr, rangeLength, failed)
+                pending = failed
+                if len(pending) == 0: return
+            raise camino.CaminoException(f"Flash stream failed for {len(pending)} chunk(s) after {ECalHalCamino._STREAM_ATTEMPTS} attempts")
+        finally:
+            if self._connection.port.baudrate != ECalHalCamino._DEFAULT_BAUD:
+                self._switchBaudRate(ECalHalCamino._DEFAULT_BAUD)
+
+
+    def _receiveStream(self, addr: int, length: int, failed: list[tuple[int, int]]) -> Iterator[tuple[int, bytes]]:
+        '''Streams one range, appends ranges lost to bad frames to failed'''
+        if self._instrumentation != None: self._instrumentation.count("packet")
+        self._arduino.streamFlashT(addr, length, ECalHalCamino._STREAM_CHUNK_LENGTH)
+
+        expected = addr
+        end = addr + length
+        finished = False
+        try:
+            while True:
+                try:
+                    frame = self._readStreamFrame()
+                except camino.CaminoException:
+                    #stream went silent, everything not yet received is lost
+                    break
+                if frame == None: 
+                    if self._instrumentation != None: self._instrumentation.count("badFrame")
+                    continue
+
+                frameAddr, data = frame
+                if (frameAddr < expected) | (frameAddr > end): continue
+                if frameAddr > expected: failed.append((expected, frameAddr - expected))
+                if len(data) == 0: 
+                    expected = frameAddr
+                    finished = True
+                    break
+                expected = frameAddr + len(data)
+                if self._instrumentation != None: 
+                    self._instrumentation.count("flashBytes", len(data))
+                    self._instrumentation.count("streamFrame")
+                yield frameAddr, data
+        finally:
+            if expected < end: failed.append((expected, end - expected))
+            if not finished: self._drainStream()
+            #the firmware's pointer after a stream is unknown, the next read sends its address
+            self._last_eeprom_address = None
+
+
+    def _readStreamFrame(self) -> tuple[int, bytes] | None:
+        '''Returns (address, data) of the next frame, None if it failed the checksum'''
+        port = self._connection.port
+
+        #hunt for the sync bytes
+        previous = None
+        while True:
+            b = port.read(1)
+            if len(b) != 1: raise camino.CaminoException("Flash stream timed out.")
+            if (previous == ECalHalCamino._STREAM_SYNC[0]) & (b[0] == ECalHalCamino._STREAM_SYNC[1]): break
+            previous = b[0]
+
+        header = port.read(4)
+        if len(header) != 4: raise camino.CaminoException("Flash stream timed out.")
+        if header[3] > ECalHalCamino._STREAM_CHUNK_LENGTH: return None
+
+        body = port.read(header[3] + 2)
+        if len(body) != header[3] + 2: raise camino.CaminoException("Flash stream timed out.")
+
+        data = body[:-2]
+        crc = int.from_bytes(body[-2:], byteorder="little", signed=False)
+        if binascii.crc_hqx(header + data, 0xFFFF) != crc: return None
+
+        return int.from_bytes(header[:3], byteorder="little", signed=False), data
+
+
+    def _drainStream(self) -> None:
+        '''Discards the rest of an abandoned stream until the line goes quiet'''
+        port = self._connection.port
+        while len(port.read(max(port.in_waiting, 1))) > 0:
+            pass
+        port.reset_input_buffer()
+
+
+    def _switchBaudRate(self, baud: int) -> bool:
+        '''Switches both ends to the given baud rate, returns False (at the default baud) if the link didn't come up'''
+        port = self._connection.port
+        if port.baudrate == baud: return True
+
+        if self._instrumentation != None: self._instrumentation.count("baudSwitch")
+        try:
+            self._arduino.setBaudRateT(baud)
+        except camino.CaminoException:
+            return False
+
+        self._sleep(0.01)
+        port.baudrate = baud
+        port.reset_input_buffer()
+        try:
+            self._arduino.confirmBaudRateT()
+            return True
+        except camino.CaminoException:
+            #firmware falls back to the default baud on its own
+            port.baudrate = ECalHalCamino._DEFAULT_BAUD
+            self._sleep(ECalHalCamino._BAUD_CONFIRM_TIMEOUT)
+            port.reset_input_buffer()
+            return baud == ECalHalCamino._DEFAULT_BAUD
+
+
+    def _negotiateBaudRate(self, candidates: List[int]) -> int:
+        '''Returns the highest candidate baud rate the link is stable at, leaves the link switched to it'''
+        for baud in sorted(candidates, reverse=True):
+            if not self._switchBaudRate(baud): continue
+            try:
+                #a full packet echoed back at this rate
+                probe = bytes(range(camino.MAX_DATA_LENGTH))
+                if self._arduino.echo(list(probe), out=bytes) == probe: return baud
+            except camino.CaminoException:
+                pass
+            self._switchBaudRate(ECalHalCamino._DEFAULT_BAUD)
+        return ECalHalCamino._DEFAULT_BAUD
+
+
+    def _sleep(self, seconds: float) -> None:
+        if self._instrumentation != None: self._instrumentation.sleep(seconds)
+        else: time.sleep(seconds)
+
+
+
+class ECalHalCaminoAsync(ECalHalAsync):
+    '''
+    Async Camino HAL. Reads are awaited one Camino packet at a time, 
+    so gate switching and other requests on the same module get in between the packets of a long read.
+    '''
+
+    def __init__(self, hal: ECalHalCamino, executor: Executor = None) -> None:
+        super().__init__(hal, executor)
+
+    async def readBlock(self, addr: int, length: int) -> bytes:
+        block = bytes()
+        while len(block) < length:
+            chunkLength = min(length - len(block), self._hal._MAX_BLOCK_LENGTH)
+            block += await self.run(self._hal._readBlockFromFlash, addr + len(block), chunkLength)
+        return block
@@ -1,12 +1,27 @@
 from ftd2xx.ftd2xx import DeviceInfoDetail
 from ftd2xx import * 
 import time
+import json
+from pathlib import Path
 from typing import List
 
+from .abstract import ECalControlAbc
 from .ecalHalBase import ECalHal
 
 class ECalHalFtdi(ECalHal):
 
+    #conservative delays in seconds, used until the adapter's timing is calibrated
+    _DEFAULT_TIMING = {"dirSwitchTime": 0.016, "resetPulseTime": 0.01, "resetRecoveryTime": 0.016}
+
+    #delays calibrateTiming can check, a too short reset pulse isn't visible in reads (they latch the address again)
+    _CALIBRATED_TIMING = ("dirSwitchTime", "resetRecoveryTime")
+
+    #floor for calibrated delays, in seconds
+    _MIN_CALIBRATED_DELAY = 0.0005
+
+    #calibrated timing per FTDI serial
+    _TIMING_FILE_PATH = Path(__file__).parent.resolve().joinpath("data", "ftdiTiming.json")
+
     def __init__(self, portInfoPair : tuple[DeviceInfoDetail, DeviceInfoDetail]):
 
         try:
@@ -27,6 +42,13 @@ class ECalHalFtdi(ECalHal):
             
         self._cPort: FTD2XX = controlPort
         self._dPort: FTD2XX = dataPort
+        self._serial: str = portInfoPair[0]["serial"].decode()[:-1]
+
+        self._dirSwitchTime = ECalHalFtdi._DEFAULT_TIMING["dirSwitchTime"]
+        self._resetPulseTime = ECalHalFtdi._DEFAULT_TIMING["resetPulseTime"]
+        self._resetRecoveryTime = ECalHalFtdi._DEFAULT_TIMING["resetRecoveryTime"]
+        stored = ECalHalFtdi._loadTimings().get(self._serial, {})
+        self._applyTiming({name: stored[name] for name in ECalHalFtdi._CALIBRATED_TIMING if name in stored})
 
         self._ADDR = 0
         self._ENn = 1
@@ -37,21 +59,31 @@ class ECalHalFtdi(ECalHal):
 
         self._DataByte = 0
         self._DPortIsWrite = False
-        self._dPort.setBitMode(0,4) #set data port to read
-        self._cPort.setBitMode(0b11111110,4) #set control port to write
+        self._cQueue = bytearray()
+        self._dQueue = bytearray()
+        self._usbSetBitMode(self._dPort, 0) #set data port to read
+        self._usbSetBitMode(self._cPort, 0b11111110) #set control port to write
         self._writeFtdiControlPort()
-        self._writeFtdiControlPort(RESETn=0)
-        time.sleep(0.01)
-        self._writeFtdiControlPort(RESETn=1)
-        time.sleep(0.016)
+        self._resetWithDelays()
 
 
     def __del__(self):
+        self.close()
+
+    def close(self):
         if self._cPort != None: self._cPort.close()
         if self._dPort != None: self._dPort.close()
+        self._cPort = None
+        self._dPort = None
 
+    @property
+    def serial(self) -> str:
+        '''FT2232 serial number without the port letter'''
+        return self._serial
 
-    def _writeFtdiControlPort(self, ADDR = None, ENn = None, OEn = None, WEn = None, RESETn = None, Detect = None):
+
+    def _queueFtdiControlPort(self, ADDR = None, ENn = None, OEn = None, WEn = None, RESETn = None, Detect = None):
+        '''Queues one control port state, sent with the next flush'''
         dataByte = 0
 
         if (ADDR != None): self._ADDR = ADDR
@@ -65,82 +97,205 @@ class ECalHalFtdi(ECalHal):
         for bit in bitList:
             dataByte = (dataByte << 1) | bit
 
-        self._cPort.write(bytes([dataByte]))
+        self._cQueue.append(dataByte)
 
-    def _writeFtdiDataPort(self, dataByte):
+    def _queueFtdiDataPort(self, dataByte):
+        '''Queues one data port output byte, sent with the next flush'''
         self._DataByte = dataByte
         if self._DPortIsWrite == False: 
+            self._flushFtdiPorts()
             self._DPortIsWrite = True
-            self._dPort.setBitMode(0b11111111,4)
-        self._dPort.write(bytes([self._DataByte]))
+            self._usbSetBitMode(self._dPort, 0b11111111)
+            if self._instrumentation != None: self._instrumentation.count("directionSwitch")
+        self._dQueue.append(self._DataByte)
+
+    def _queueLatch(self):
+        if self._instrumentation != None: self._instrumentation.count("latch")
+        self._queueFtdiControlPort(ENn = 0)
+        self._queueFtdiControlPort(ENn = 1)
+
+    def _usbWrite(self, port: FTD2XX, data: bytes) -> None:
+        if self._instrumentation != None: self._instrumentation.count("usbWrite")
+        port.write(data)
+
+    def _usbSetBitMode(self, port: FTD2XX, mask: int) -> None:
+        '''Pin directions, sent to the adapter like a write'''
+        if self._instrumentation != None: self._instrumentation.count("usbWrite")
+        port.setBitMode(mask, 4)
+
+    def _flushFtdiPorts(self):
+        '''Sends each port's queued edges in a single write, data port first so it is settled before the control edges'''
+        if len(self._dQueue) > 0:
+            self._usbWrite(self._dPort, bytes(self._dQueue))
+            self._dQueue.clear()
+        if len(self._cQueue) > 0:
+            self._usbWrite(self._cPort, bytes(self._cQueue))
+            self._cQueue.clear()
+
+    def _writeFtdiControlPort(self, ADDR = None, ENn = None, OEn = None, WEn = None, RESETn = None, Detect = None):
+        self._queueFtdiControlPort(ADDR, ENn, OEn, WEn, RESETn, Detect)
+        self._flushFtdiPorts()
+
+    def _writeFtdiDataPort(self, dataByte):
+        self._queueFtdiDataPort(dataByte)
+        self._flushFtdiPorts()
 
     def _readFtdiDataPort(self) -> int:
+        self._flushFtdiPorts()
         if self._DPortIsWrite == True: 
             self._DPortIsWrite = False
-            self._dPort.setBitMode(0b00000000,4)
+            self._usbSetBitMode(self._dPort, 0b00000000)
+            if self._instrumentation != None: self._instrumentation.count("directionSwitch")
 
         while True:
             rxq,txq,evt = self._dPort.getStatus()
             if txq == 0: break
-        self._dPort.write(bytes([0]))
+        self._usbWrite(self._dPort, bytes([0]))
         rxq,txq,evt = self._dPort.getStatus()
         self._DataByte = self._dPort.read(rxq+1)
         return int(self._DataByte[-1])
 
     def _setDataPortToIn(self):
+        self._flushFtdiPorts()
         if self._DPortIsWrite: 
             self._DPortIsWrite = False
-            self._dPort.setBitMode(0b00000000,4)
+            self._usbSetBitMode(self._dPort, 0b00000000)
+            if self._instrumentation != None: self._instrumentation.count("directionSwitch")
 
     def _latch(self): 
-        self._writeFtdiControlPort(ENn = 0)
-        self._writeFtdiControlPort(ENn = 1)
+        self._queueLatch()
+        self._flushFtdiPorts()
 
     def _reset(self):
-        self._writeFtdiControlPort(RESETn = 0)
-        self._writeFtdiControlPort(RESETn = 1)
+        if self._instrumentation != None: self._instrumentation.count("reset")
+        self._queueFtdiControlPort(RESETn = 0)
+        self._queueFtdiControlPort(RESETn = 1)
+        self._flushFtdiPorts()
 
 
     def _writeByte(self,addr: int, value: int) -> None:
-        self._writeFtdiDataPort(value & 0x00ff)
-        self._writeFtdiControlPort(addr)
-        self._latch()
+        if self._instrumentation != None: self._instrumentation.count("writeByte")
+        self._queueFtdiDataPort(value & 0x00ff)
+        self._queueFtdiControlPort(addr)
+        self._queueLatch()
+        self._flushFtdiPorts()
 
 
     def _readByteFromFlash(self, addr) -> int:
-        
+        if self._instrumentation != None: self._instrumentation.count("flashBytes")
+
         addr0_7 = (addr & 0x000000FF) >> 0
         addr8_15 = (addr & 0x0000FF00) >> 8
         addr16_17 = (addr & 0x00030000) >> 16
 
-        self._writeFtdiDataPort(addr0_7)
-        self._writeFtdiControlPort(ADDR = ECalHalFtdi._MUX_ADDR_FLASH_ADDR_0_7)
-        self._latch()
-
-        self._writeFtdiDataPort(addr8_15)
-        self._writeFtdiControlPort(ADDR = ECalHalFtdi._MUX_ADDR_FLASH_ADDR_8_15)
-        self._latch()
+        #one data port and one control port write per latched address byte
+        for muxAddr, addrByte in ((ECalHalFtdi._MUX_ADDR_FLASH_ADDR_0_7, addr0_7), 
+                                  (ECalHalFtdi._MUX_ADDR_FLASH_ADDR_8_15, addr8_15), 
+                                  (ECalHalFtdi._MUX_ADDR_FLASH_ADDR_16_17, addr16_17)):
+            self._queueFtdiDataPort(addrByte)
+            self._queueFtdiControlPort(ADDR = muxAddr)
+            self._queueLatch()
+            self._flushFtdiPorts()
 
-        self._writeFtdiDataPort(addr16_17)
-        self._writeFtdiControlPort(ADDR = ECalHalFtdi._MUX_ADDR_FLASH_ADDR_16_17)
-        self._latch()
-
-        self._dPort.setBitMode(0,4) #set data pins to read
+        self._usbSetBitMode(self._dPort, 0) #set data pins to read
         self._DPortIsWrite = False
-        time.sleep(0.016)
+        if self._instrumentation != None: self._instrumentation.count("directionSwitch")
+        self._sleep(self._dirSwitchTime)
 
-        self._writeFtdiControlPort(ADDR= ECalHalFtdi._MUX_ADDR_FLASH_DATA)
-        self._writeFtdiControlPort(ENn = 0)
-        self._writeFtdiControlPort(OEn = 0)
+        self._queueFtdiControlPort(ADDR= ECalHalFtdi._MUX_ADDR_FLASH_DATA)
+        self._queueFtdiControlPort(ENn = 0)
+        self._queueFtdiControlPort(OEn = 0)
+        self._flushFtdiPorts()
 
         readByte = self._readFtdiDataPort()
 
-        self._writeFtdiControlPort(OEn= 1)
-        self._writeFtdiControlPort(ENn= 1)
+        self._queueFtdiControlPort(OEn= 1)
+        self._queueFtdiControlPort(ENn= 1)
+        self._flushFtdiPorts()
 
         return readByte
 
 
+    def _resetWithDelays(self):
+        if self._instrumentation != None: self._instrumentation.count("reset")
+        self._writeFtdiControlPort(RESETn=0)
+        self._sleep(self._resetPulseTime)
+        self._writeFtdiControlPort(RESETn=1)
+        self._sleep(self._resetRecoveryTime)
+
+    def _sleep(self, seconds: float):
+        if seconds <= 0: return
+        if self._instrumentation != None: self._instrumentation.sleep(seconds)
+        else: time.sleep(seconds)
+
+
+    @property
+    def timing(self) -> dict[str, float]:
+        return {"dirSwitchTime": self._dirSwitchTime, "resetPulseTime": self._resetPulseTime, "resetRecoveryTime": self._resetRecoveryTime}
+
+    def _applyTiming(self, timing: dict[str, float]) -> None:
+        if "dirSwitchTime" in timing: self._dirSwitchTime = timing["dirSwitchTime"]
+        if "resetPulseTime" in timing: self._resetPulseTime = timing["resetPulseTime"]
+        if "resetRecoveryTime" in timing: self._resetRecoveryTime = timing["resetRecoveryTime"]
+
+    def _loadTimings() -> dict[str, dict[str, float]]:
+        try:
+            with open(ECalHalFtdi._TIMING_FILE_PATH, "r") as f:
+                return json.load(f)
+        except:
+            return {}
+
+    def _saveTiming(self) -> None:
+        timings = ECalHalFtdi._loadTimings()
+        timings[self._serial] = {name: self.timing[name] for name in ECalHalFtdi._CALIBRATED_TIMING}
+        tempPath = ECalHalFtdi._TIMING_FILE_PATH.with_suffix(".tmp")
+        with open(tempPath, "w") as f:
+            json.dump(timings, f, indent=4)
+        tempPath.replace(ECalHalFtdi._TIMING_FILE_PATH)
+
+
+    def _readReferenceBytes(self, length: int) -> bytes:
+        return bytes([self._readByteFromFlash(ECalControlAbc._EEPROM_ADDR_MODELNO + i) for i in range(length)])
+
+    def _isReliable(self, reference: bytes, repeats: int, afterReset: bool = False) -> bool:
+        for i in range(repeats):
+            if afterReset: self._resetWithDelays()
+            if self._readReferenceBytes(len(reference)) != reference: return False
+        return True
+
+    def calibrateTiming(self, repeats: int = 8, margin: float = 1.5, referenceLength: int = 8, save: bool = True) -> dict[str, float]:
+        '''Finds the shortest delays that still read the model number reliably, applies them and stores them for this adapter.
+        Each delay is halved from its conservative default until a read of the reference bytes fails, the last good value
+        is then padded by margin, and never set below _MIN_CALIBRATED_DELAY. The reset pulse keeps its default width.'''
+
+        self._applyTiming(ECalHalFtdi._DEFAULT_TIMING)
+        self._resetWithDelays()
+
+        reference = self._readReferenceBytes(referenceLength)
+        if (reference[0] == 0) | (reference[0] == 0xff) | (not self._isReliable(reference, repeats)):
+            raise Exception("Unable to read a stable model number from the ECal at default timing.")
+
+        for name in ECalHalFtdi._CALIBRATED_TIMING:
+            #recovery is only exercised by reading right after a reset
+            afterReset = name == "resetRecoveryTime"
+            default = ECalHalFtdi._DEFAULT_TIMING[name]
+            lastGood = default
+            candidate = default / 2
+            while True:
+                if candidate < 0.00025: candidate = 0
+                self._applyTiming({name: candidate})
+                if not self._isReliable(reference, repeats, afterReset): break
+                lastGood = candidate
+                if candidate == 0: break
+                candidate /= 2
+            #a delay that passed at 0 still gets some headroom
+            self._applyTiming({name: min(max(lastGood * margin, ECalHalFtdi._MIN_CALIBRATED_DELAY), default)})
+
+        self._resetWithDelays()
+        if save: self._saveTiming()
+        return self.timing
+
+
     def getValidFT2232PortPairs() -> List[tuple[DeviceInfoDetail, DeviceInfoDetail]]:
         try:
             n = createDeviceInfoList()
@@ -148,20 +303,22 @@ class ECalHalFtdi(ECalHal):
             for i in range(n):
                 infoDetails.append(getDeviceInfoDetail(i))
 
+            #B ports by serial without the port letter and location, A ports are paired by lookup
+            ports_B : dict[tuple[str, int], DeviceInfoDetail] = dict()
+            for port_B in infoDetails:
+                ser_B = port_B["serial"].decode()
+                if ser_B.endswith("B"):
+                    ports_B[(ser_B[:-1], port_B["location"])] = port_B
+
             valid_port_pairs = []
             port_A : DeviceInfoDetail
             for port_A in infoDetails:
                 ser_A = port_A["serial"].decode()
                 if not ser_A.endswith("A"):
                     continue
-                
-                port_B : DeviceInfoDetail
-                for port_B in infoDetails:
-                    ser_B = port_B["serial"].decode()
-                    if not ser_B.endswith("B"):
-                        continue
-                    if ser_B[:-1] == ser_A[:-1] and port_B["location"] == port_A["location"] + 1:
-                        valid_port_pairs.append((port_A, port_B))
+                port_B = ports_B.get((ser_A[:-1], port_A["location"] + 1))
+                if port_B != None:
+                    valid_port_pairs.append((port_A, port_B))
 
             return valid_port_pairs
 
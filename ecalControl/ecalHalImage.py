@@ -0,0 +1,96 @@
+import mmap
+from pathlib import Path
+from typing import Iterator
+
+from .ecalHalBase import ECalHal
+
+
+class ECalHalImage(ECalHal):
+    '''
+    Hardware abstraction layer serving flash reads from a full flash image file captured earlier
+    (see ECalControl.captureFlashImage), so no ECal module or control adapter is needed
+    '''
+
+    _MAX_BLOCK_LENGTH = ECalHal._FLASH_SIZE
+
+    #erased flash reads back all ones
+    _ERASED_BYTE = 0xff
+
+    def __init__(self, imagePath: Path):
+
+        self._file = None
+        self._image = None
+
+        try:
+            self._file = open(imagePath, "rb")
+            self._image = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception as e:
+            if self._file != None: self._file.close()
+            self._file = None
+            self._image = None
+            raise e
+
+        self._imagePath = Path(imagePath)
+        self._latches = dict()
+
+
+    def __del__(self) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._image != None: self._image.close()
+        if self._file != None: self._file.close()
+        self._image = None
+        self._file = None
+
+
+    def _writeByte(self,addr: int, value: int) -> None:
+        #nothing to switch, keep the latched values for inspection
+        if self._instrumentation != None: self._instrumentation.count("writeByte")
+        self._latches[addr] = value
+
+
+    def _readByteFromFlash(self, addr: int) -> int:
+        if self._instrumentation != None: self._instrumentation.count("flashBytes")
+        if addr < len(self._image): return self._image[addr]
+        return ECalHalImage._ERASED_BYTE
+
+
+    def _readBlockFromFlash(self, addr: int, length: int) -> bytes:
+        if self._instrumentation != None: self._instrumentation.count("flashBytes", length)
+        block = self._image[addr:addr + length]
+        return block + bytes([ECalHalImage._ERASED_BYTE]) * (length - len(block))
+
+
+    def _streamBlocksFromFlash(self, addr: int, length: int) -> Iterator[tuple[int, bytes]]:
+        yield addr, self._readBlockFromFlash(addr, length)
+
+
+    @property
+    def imagePath(self) -> Path:
+        return self._imagePath
+
+
+    def imageFileName(model: str, serialNo: str) -> str:
+        return "ECal " + model + " s_n " + serialNo + ".bin"
+
+
+    def forModule(model: str, serialNo: str, folder: Path = None) -> 'ECalHalImage':
+        '''Opens the image captured from the given module, by default from the library's data folder'''
+        if folder == None:
+            folder = Path(__file__).parent.resolve().joinpath("data")
+        return ECalHalImage(folder.joinpath(ECalHalImage.imageFileName(model, serialNo)))
+
+
+    def captureImage(hal: ECalHal, filePath: Path, addr: int = 0, length: int = ECalHal._FLASH_SIZE) -> Path:
+        '''Dumps the given flash range of the module behind hal into filePath, using the HAL's fastest sequential read'''
+        filePath = Path(filePath)
+        partPath = filePath.with_suffix(filePath.suffix + ".part")
+
+        with open(partPath, "wb") as f:
+            for blockAddr, block in hal._streamBlocksFromFlash(addr, length):
+                f.seek(blockAddr - addr)
+                f.write(block)
+
+        partPath.replace(filePath)
+        return filePath
@@ -0,0 +1,210 @@
+import math
+import re
+import struct
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from skrf import Network
+
+from .abstract import ECalControlAbc
+from .abstract import CorrectionSetScope
+from .ecalHalBase import ECalHal
+
+
+@dataclass(frozen=True)
+class ECalLatencyProfile:
+    '''
+    Cost model of an ECal control adapter, in seconds
+    perTransaction: one host round trip (USB write burst, Camino packet)
+    perByte: each flash byte moved to the host
+    perDirectionSwitch: turning the data bus around for a flash read
+    maxBlockLength: flash bytes returned per transaction
+    '''
+    name: str
+    perTransaction: float = 0.0
+    perByte: float = 0.0
+    perDirectionSwitch: float = 0.0
+    maxBlockLength: int = 1
+
+#no latency at all, for functional tests
+ECalLatencyProfile.IDEAL = ECalLatencyProfile("ideal", maxBlockLength=ECalHal._FLASH_SIZE)
+#FT2232D bit-bang: a few USB frames per byte and a slow data port direction switch per read
+ECalLatencyProfile.FTDI = ECalLatencyProfile("ftdi", perTransaction=0.002, perDirectionSwitch=0.016, maxBlockLength=1)
+#Camino on the Nano Every at 115200 baud: packet round trip plus serial time per byte
+ECalLatencyProfile.CAMINO = ECalLatencyProfile("camino", perTransaction=0.004, perByte=10/115200, maxBlockLength=250)
+
+
+class ECalHalSim(ECalHal):
+    '''
+    Emulated ECal module for testing and benchmarking without hardware.
+    Builds a byte exact flash image (info block, correction set headers, standard id tables, frequency list, float32 data)
+    from the module's touchstone files in the data folder, tracks the latches written through _writeByte
+    and charges each transaction according to a latency profile.
+    Time is simulated and accumulated in elapsedTime, or actually slept with realTime.
+    '''
+
+    _STANDARD_FILE_PATTERN = re.compile(r"ECal (\S+) s_n (\S+) set (\S+) std 0x([0-9a-fA-F]+)\.s(\d)p")
+
+    _CORRSET_ADDR = {CorrectionSetScope.PORT_A: ECalControlAbc._EEPROM_ADDR_CORRSET1,
+                     CorrectionSetScope.PORT_B: ECalControlAbc._EEPROM_ADDR_CORRSET2,
+                     CorrectionSetScope.THRU_AB: ECalControlAbc._EEPROM_ADDR_CORRSET3,
+                     CorrectionSetScope.VERIFY_AB: ECalControlAbc._EEPROM_ADDR_CORRSET4}
+
+    _FREQ_LIST_ADDR = 0x0200
+
+    def __init__(self,
+                 model: str = None,
+                 serialNo: str = None,
+                 dataFolder: Path = None,
+                 latency: ECalLatencyProfile = ECalLatencyProfile.IDEAL,
+                 realTime: bool = False,
+                 connectorType: str = "3.5F3.5M",
+                 warmupTime: int = 10,
+                 lastCertification: str = "01/01/2000") -> None:
+
+        if dataFolder == None:
+            dataFolder = Path(__file__).parent.resolve().joinpath("data")
+
+        self._latency = latency
+        self._realTime = realTime
+        self._MAX_BLOCK_LENGTH = latency.maxBlockLength
+
+        self._flash = ECalHalSim.buildFlashImage(dataFolder, model, serialNo, connectorType, warmupTime, lastCertification)
+
+        self._latches = dict()
+        self.elapsedTime = 0.0
+        self.transactions = 0
+        self.bytesRead = 0
+
+
+    def _charge(self, transactions: int = 1, numBytes: int = 0, directionSwitches: int = 0) -> None:
+        cost = transactions * self._latency.perTransaction + numBytes * self._latency.perByte + directionSwitches * self._latency.perDirectionSwitch
+        self.transactions += transactions
+        self.bytesRead += numBytes
+        self.elapsedTime += cost
+        if self._instrumentation != None:
+            self._instrumentation.count("transaction", transactions)
+            if numBytes > 0: self._instrumentation.count("flashBytes", numBytes)
+            if directionSwitches > 0: self._instrumentation.count("directionSwitch", directionSwitches)
+            self._instrumentation.count("simulatedTime", cost)
+        if self._realTime & (cost > 0): time.sleep(cost)
+
+
+    def _reset(self) -> None:
+        #master reset clears all latches
+        self._latches.clear()
+        self._charge()
+
+
+    def _writeByte(self,addr: int, value: int) -> None:
+        if self._instrumentation != None: self._instrumentation.count("writeByte")
+        self._latches[addr] = value & 0xff
+        self._charge()
+
+
+    def _readByteFromFlash(self, addr: int) -> int:
+        self._charge(1, 1, 1)
+        self._latchFlashAddress(addr)
+        return self._flash[addr]
+
+
+    def _readBlockFromFlash(self, addr: int, length: int) -> bytes:
+        if self._MAX_BLOCK_LENGTH <= 1:
+            return super()._readBlockFromFlash(addr, length)
+
+        self._charge(math.ceil(length / self._MAX_BLOCK_LENGTH), length, 1 if length > 0 else 0)
+        if length > 0: self._latchFlashAddress(addr + length - 1)
+        return bytes(self._flash[addr:addr + length])
+
+
+    def _latchFlashAddress(self, addr: int) -> None:
+        self._latches[ECalHal._MUX_ADDR_FLASH_ADDR_0_7] = addr & 0xff
+        self._latches[ECalHal._MUX_ADDR_FLASH_ADDR_8_15] = (addr >> 8) & 0xff
+        self._latches[ECalHal._MUX_ADDR_FLASH_ADDR_16_17] = (addr >> 16) & 0x03
+
+
+    @property
+    def gates(self) -> int:
+        '''Gate word currently latched, 0 after reset'''
+        return (self._latches.get(ECalHal._MUX_ADDR_GATES_9_16, 0) << 8) | self._latches.get(ECalHal._MUX_ADDR_GATES_1_8, 0)
+
+    @property
+    def latency(self) -> ECalLatencyProfile:
+        return self._latency
+
+    @property
+    def flashImage(self) -> bytes:
+        return bytes(self._flash)
+
+
+    def resetCounters(self) -> None:
+        self.elapsedTime = 0.0
+        self.transactions = 0
+        self.bytesRead = 0
+
+
+    def buildFlashImage(dataFolder: Path,
+                        model: str = None,
+                        serialNo: str = None,
+                        connectorType: str = "3.5F3.5M",
+                        warmupTime: int = 10,
+                        lastCertification: str = "01/01/2000") -> bytearray:
+        '''Lays out the flash of a module from its touchstone files, the first module found if model and serialNo aren't given'''
+
+        standards : dict[CorrectionSetScope, list[tuple[int, Network]]] = dict()
+        for path in sorted(Path(dataFolder).glob("ECal *.s?p")):
+            m = ECalHalSim._STANDARD_FILE_PATTERN.fullmatch(path.name)
+            if m == None: continue
+            if model == None: model = m[1]
+            if serialNo == None: serialNo = m[2]
+            if (m[1] != model) | (m[2] != serialNo): continue
+            standards.setdefault(CorrectionSetScope[m[3]], []).append((int(m[4], 16), Network(str(path))))
+
+        if len(standards) == 0:
+            raise FileNotFoundError(f"No characterization data found for ECal {model} s_n {serialNo} in {dataFolder}")
+
+        frequencies = next(iter(standards.values()))[0][1].f
+        numFrequencies = len(frequencies)
+
+        flash = bytearray([0xff]) * ECalHal._FLASH_SIZE
+        def put(addr: int, data: bytes):
+            flash[addr:addr + len(data)] = data
+
+        put(ECalControlAbc._EEPROM_ADDR_NOPOINTS, struct.pack("<H", numFrequencies))
+        put(ECalControlAbc._EEPROM_ADDR_WARMUP, struct.pack("<H", warmupTime))
+        put(ECalControlAbc._EEPROM_ADDR_MODELNO, model.encode() + bytes(1))
+        put(ECalControlAbc._EEPROM_ADDR_SERNO, serialNo.encode() + bytes(1))
+        put(ECalControlAbc._EEPROM_ADDR_CONNTYPE, connectorType.encode() + bytes(1))
+        put(ECalControlAbc._EEPROM_ADDR_LASTCERT, lastCertification.encode() + bytes(1))
+
+        put(ECalControlAbc._EEPROM_ADDR_FREQ_NO, struct.pack("<H", numFrequencies))
+        put(ECalControlAbc._EEPROM_ADDR_FREQ_ADDR, struct.pack("<I", ECalHalSim._FREQ_LIST_ADDR))
+        put(ECalHalSim._FREQ_LIST_ADDR, np.asarray(frequencies, dtype="<f8").tobytes())
+
+        addr = ECalHalSim._FREQ_LIST_ADDR + numFrequencies * 8
+        for scope, headerAddr in ECalHalSim._CORRSET_ADDR.items():
+            setStandards = standards.get(scope, [])
+            numPorts = setStandards[0][1].nports if len(setStandards) > 0 else 1
+            paramsPerStandard = numPorts * numPorts
+
+            standardsAddr = addr
+            put(standardsAddr, struct.pack(f"<{len(setStandards)}H", *[id for id, nwk in setStandards]))
+            dataAddr = standardsAddr + 2 * len(setStandards)
+
+            put(headerAddr, struct.pack("<HHHII", len(setStandards), numFrequencies, len(setStandards) * paramsPerStandard, standardsAddr, dataAddr))
+
+            #per standard: one trace of complex64 per s-parameter, s-parameters in row major order
+            for index, (id, nwk) in enumerate(setStandards):
+                if len(nwk.f) != numFrequencies:
+                    raise ValueError(f"Standard 0x{id:04x} in {scope.name} has a different frequency grid.")
+                traces = nwk.s.reshape(numFrequencies, paramsPerStandard).T.astype("<c8")
+                put(dataAddr + index * paramsPerStandard * numFrequencies * 8, traces.tobytes())
+
+            addr = dataAddr + len(setStandards) * paramsPerStandard * numFrequencies * 8
+
+        if addr > ECalHal._FLASH_SIZE:
+            raise ValueError("Characterization data doesn't fit the flash.")
+
+        return flash
@@ -0,0 +1,83 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ECalInstrumentation():
+    '''
+    Opt-in counters for HAL traffic (writes, latches, direction switches, packets, sleep time, ...).
+    Events are attributed to the high level operation in progress, nested operations are keyed by their path
+    e.g. "ECalControl._storeMetadata/ECalCorrectionSet._readHeader" for the headers read when a module's metadata is first cached.
+    Attach to a HAL with hal.attachInstrumentation(), HALs without one attached only pay for a None check.
+    '''
+
+    _NO_OPERATION = "<none>"
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._operations : dict[str, dict] = dict()
+
+
+    def _stack(self) -> list[str]:
+        if not hasattr(self._local, "stack"): self._local.stack = []
+        return self._local.stack
+
+    def _entry(self, path: str) -> dict:
+        entry = self._operations.get(path)
+        if entry == None:
+            entry = {"calls": 0, "seconds": 0.0, "events": dict()}
+            self._operations[path] = entry
+        return entry
+
+
+    @contextmanager
+    def operation(self, name: str):
+        stack = self._stack()
+        stack.append(name if len(stack) == 0 else stack[-1] + "/" + name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            path = stack.pop()
+            with self._lock:
+                entry = self._entry(path)
+                entry["calls"] += 1
+                entry["seconds"] += seconds
+
+
+    def count(self, event: str, n: float = 1) -> None:
+        stack = self._stack()
+        path = stack[-1] if len(stack) > 0 else ECalInstrumentation._NO_OPERATION
+        with self._lock:
+            events = self._entry(path)["events"]
+            events[event] = events.get(event, 0) + n
+
+
+    def sleep(self, seconds: float) -> None:
+        '''time.sleep that books the time slept as sleepTime'''
+        self.count("sleepTime", seconds)
+        time.sleep(seconds)
+
+
+    def reset(self) -> None:
+        with self._lock:
+            self._operations.clear()
+
+
+    def toDict(self) -> dict:
+        with self._lock:
+            return {path: {"calls": entry["calls"], "seconds": entry["seconds"], "events": dict(entry["events"])}
+                    for path, entry in self._operations.items()}
+
+    def toJson(self, **kwargs) -> str:
+        return json.dumps(self.toDict(), **kwargs)
+
+    def __str__(self) -> str:
+        lines = []
+        for path, entry in self.toDict().items():
+            events = ", ".join(f"{event} {value:g}" for event, value in sorted(entry["events"].items()))
+            lines.append(f"{path}: {entry['calls']} call(s), {entry['seconds']:.3f}s - {events}")
+        return "\n".join(lines)
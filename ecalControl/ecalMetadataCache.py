@@ -0,0 +1,72 @@
+import json
+import threading
+import zlib
+from pathlib import Path
+
+from .abstract import ECalControlAbc
+
+
+class ECalMetadataCache():
+    '''
+    Parsed module metadata (info block, correction set headers, standard ids, frequency list) kept on disk per serial number.
+    An entry is only used if the module's fingerprint still matches: the serial number plus a CRC32 over the
+    frequency list pointer and the correction set headers, i.e. a few dozen flash bytes instead of hundreds.
+    '''
+
+    #frequency count and address followed by the four correction set headers
+    _FINGERPRINT_ADDR = ECalControlAbc._EEPROM_ADDR_FREQ_NO
+    _FINGERPRINT_LENGTH = ECalControlAbc._EEPROM_ADDR_CORRSET4 + 14 - ECalControlAbc._EEPROM_ADDR_FREQ_NO
+
+    _SERIAL_MAXLEN = 7
+
+    def __init__(self, filePath: Path = None) -> None:
+        if filePath == None:
+            filePath = Path(__file__).parent.resolve().joinpath("data", "ecalMetadata.json")
+        self._filePath = Path(filePath)
+        self._lock = threading.Lock()
+
+
+    @property
+    def filePath(self) -> Path:
+        return self._filePath
+
+
+    def fingerprint(ecal: ECalControlAbc) -> tuple[str, int]:
+        '''Reads (serial number, header CRC32) from the module'''
+        serialNo = ecal.readStringFromFlash(ECalControlAbc._EEPROM_ADDR_SERNO, maxlen = ECalMetadataCache._SERIAL_MAXLEN)
+        header = ecal.readBytesFromFlash(ECalMetadataCache._FINGERPRINT_ADDR, ECalMetadataCache._FINGERPRINT_LENGTH)
+        return serialNo, zlib.crc32(header)
+
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            with open(self._filePath, "r") as f:
+                return json.load(f)
+        except:
+            return {}
+
+    def lookup(self, serialNo: str, crc: int) -> dict | None:
+        '''Metadata of the module if known and its fingerprint matches, None otherwise'''
+        with self._lock:
+            entry = self._load().get(serialNo)
+        if (entry == None) or (entry.get("fingerprint") != crc): return None
+        return entry
+
+    def store(self, serialNo: str, crc: int, metadata: dict) -> None:
+        with self._lock:
+            entries = self._load()
+            entries[serialNo] = dict(metadata, fingerprint=crc)
+            self._save(entries)
+
+    def forget(self, serialNo: str) -> None:
+        with self._lock:
+            entries = self._load()
+            if entries.pop(serialNo, None) == None: return
+            self._save(entries)
+
+    def _save(self, entries: dict[str, dict]) -> None:
+        #never leave a truncated file behind
+        tempPath = self._filePath.with_suffix(".tmp")
+        with open(tempPath, "w") as f:
+            json.dump(entries, f, indent=4)
+        tempPath.replace(self._filePath)
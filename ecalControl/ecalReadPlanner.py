@@ -0,0 +1,92 @@
+import bisect
+
+from .abstract import ECalHalAbc
+
+
+class ECalFlashSnapshot():
+    '''
+    Flash content read by an ECalReadPlanner, as non-overlapping (address, bytes) bursts sorted by address
+    '''
+
+    def __init__(self, bursts: list[tuple[int, bytes]] = None) -> None:
+        self._bursts : list[tuple[int, bytes]] = sorted(bursts) if bursts != None else []
+        self._starts = [addr for addr, data in self._bursts]
+
+
+    def _find(self, addr: int, length: int) -> tuple[int, bytes] | None:
+        i = bisect.bisect_right(self._starts, addr) - 1
+        if i < 0: return None
+        burstAddr, data = self._bursts[i]
+        if addr + length > burstAddr + len(data): return None
+        return burstAddr, data
+
+    def contains(self, addr: int, length: int) -> bool:
+        return self._find(addr, length) != None
+
+    def read(self, addr: int, length: int) -> bytes:
+        burst = self._find(addr, length)
+        if burst == None: raise KeyError(f"Flash range 0x{addr:05x}+{length} wasn't read.")
+        return burst[1][addr - burst[0]:addr - burst[0] + length]
+
+    def merge(self, other: 'ECalFlashSnapshot') -> 'ECalFlashSnapshot':
+        return ECalFlashSnapshot(self._bursts + other._bursts)
+
+    @property
+    def bursts(self) -> list[tuple[int, bytes]]:
+        return self._bursts
+
+    @property
+    def numBytes(self) -> int:
+        return sum(len(data) for addr, data in self._bursts)
+
+
+class ECalReadPlanner():
+    '''
+    Collects the flash regions an operation needs and reads them in as few sequential bursts as possible.
+    Overlapping and adjacent regions are merged, so are regions separated by at most maxGap bytes:
+    on HALs with block reads reading a short gap is cheaper than another round trip,
+    per byte HALs only merge touching regions. Long bursts are streamed where the HAL supports it.
+    '''
+
+    #gap bytes worth reading to save a round trip on HALs with block reads
+    _DEFAULT_MAX_GAP = 64
+    #bursts from this length on are read through the HAL's stream
+    _STREAM_THRESHOLD = 4096
+
+    def __init__(self, hal: ECalHalAbc, maxGap: int = None) -> None:
+        self._hal = hal
+        if maxGap == None: maxGap = ECalReadPlanner._DEFAULT_MAX_GAP if hal._MAX_BLOCK_LENGTH > 1 else 0
+        self._maxGap = maxGap
+        self._regions : list[tuple[int, int]] = []
+
+
+    def add(self, addr: int, length: int) -> 'ECalReadPlanner':
+        if length > 0: self._regions.append((addr, length))
+        return self
+
+    @property
+    def regions(self) -> list[tuple[int, int]]:
+        return list(self._regions)
+
+
+    def plan(self) -> list[tuple[int, int]]:
+        '''Merged (address, length) bursts in address order'''
+        bursts : list[list[int]] = []
+        for addr, length in sorted(self._regions):
+            end = addr + length
+            if (len(bursts) > 0) and (addr <= bursts[-1][1] + self._maxGap):
+                bursts[-1][1] = max(bursts[-1][1], end)
+            else:
+                bursts.append([addr, end])
+        return [(start, end - start) for start, end in bursts]
+
+
+    def read(self) -> ECalFlashSnapshot:
+        bursts = []
+        for addr, length in self.plan():
+            if length >= ECalReadPlanner._STREAM_THRESHOLD:
+                data = b"".join(block for blockAddr, block in self._hal._streamBlocksFromFlash(addr, length))
+            else:
+                data = self._hal._readBlockFromFlash(addr, length)
+            bursts.append((addr, data))
+        return ECalFlashSnapshot(bursts)
@@ -0,0 +1,301 @@
+import base64
+import json
+import os
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable
+
+from .abstract import ECalHalAbc
+from .abstract import ECalStandardAbc
+from .ecalHalBase import ECalHal
+from .ecalControlBase import ECalControl
+from .ecalMetadataCache import ECalMetadataCache
+from .ecalDeviceRegistry import ECalDeviceRegistry
+
+
+class ECalServiceError(Exception):
+    pass
+
+
+def defaultSocketPath() -> Path:
+    return Path(tempfile.gettempdir()).joinpath(f"ecalControl-{os.getuid()}.sock")
+
+
+#messages are JSON objects, each preceded by its length as a 4 byte big endian integer
+def _sendMessage(sock: socket.socket, message: dict) -> None:
+    body = json.dumps(message).encode()
+    sock.sendall(struct.pack(">I", len(body)) + body)
+
+def _receiveExactly(sock: socket.socket, length: int) -> bytes:
+    data = bytearray()
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if len(chunk) == 0: raise ConnectionError("ECal service connection closed.")
+        data += chunk
+    return bytes(data)
+
+def _receiveMessage(sock: socket.socket) -> dict:
+    length = struct.unpack(">I", _receiveExactly(sock, 4))[0]
+    return json.loads(_receiveExactly(sock, length))
+
+
+class _ECalServiceModule():
+    '''An opened module in the service, requests to it are serialized by its lock'''
+
+    def __init__(self, ecal: ECalControl) -> None:
+        self.ecal = ecal
+        self.lock = threading.Lock()
+
+
+class _ECalServiceHandler(socketserver.BaseRequestHandler):
+
+    def handle(self) -> None:
+        while True:
+            try:
+                request = _receiveMessage(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                response = {"ok": True, "result": self.server.service._handle(request)}
+            except Exception as e:
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            _sendMessage(self.request, response)
+
+
+class _ECalServiceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ECalService():
+    '''
+    Local daemon owning the ECal modules' HALs. Keeps each module open with its parsed metadata and,
+    once read, its whole flash in memory, and serves gate switching and flash reads over a Unix socket.
+    Requests to a module are serialized, so several processes can share it through ECalServiceClient.
+    Modules are opened on first request through the device registry (without rescanning), or added up front with addModule.
+    '''
+
+    def __init__(self,
+                 socketPath: Path = None,
+                 registry: ECalDeviceRegistry = None,
+                 ecalFactory: Callable[[ECalHalAbc], ECalControl] = None) -> None:
+
+        self._socketPath = Path(socketPath) if socketPath != None else defaultSocketPath()
+        self._registry = registry
+        self._ecalFactory = ecalFactory if ecalFactory != None else ECalService._openECal
+        self._modules : dict[str, _ECalServiceModule] = dict()
+        self._lock = threading.Lock()
+        self._server : _ECalServiceServer = None
+        self._thread : threading.Thread = None
+
+
+    def _openECal(hal: ECalHalAbc) -> ECalControl:
+        return ECalControl(hal, cacheMaxPages=None, metadataCache=ECalMetadataCache())
+
+
+    @property
+    def socketPath(self) -> Path:
+        return self._socketPath
+
+    @property
+    def modules(self) -> list[str]:
+        with self._lock:
+            return list(self._modules)
+
+
+    def addModule(self, module: ECalControl | ECalHalAbc) -> str:
+        '''Serves an already opened module (or HAL), returns its serial number'''
+        ecal = module if isinstance(module, ECalControl) else self._ecalFactory(module)
+        with self._lock:
+            self._modules[ecal.serialNo] = _ECalServiceModule(ecal)
+        return ecal.serialNo
+
+    def _module(self, serialNo: str) -> _ECalServiceModule:
+        with self._lock:
+            module = self._modules.get(serialNo)
+            if module != None: return module
+
+            if self._registry == None: self._registry = ECalDeviceRegistry()
+            #no rescan, it would open and reset the adapters already served
+            try:
+                hal = self._registry.open(serialNo, rescan=False)
+            except LookupError:
+                raise ECalServiceError(f"ECal s/n {serialNo} isn't known to the device registry, scan for it while the service is stopped.")
+            module = _ECalServiceModule(self._ecalFactory(hal))
+            self._modules[serialNo] = module
+            return module
+
+
+    def start(self) -> 'ECalService':
+        '''Serves in a background thread'''
+        self._listen()
+        self._thread = threading.Thread(target=self._server.serve_forever, name="ECalService", daemon=True)
+        self._thread.start()
+        return self
+
+    def serveForever(self) -> None:
+        self._listen()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._close()
+
+    def shutdown(self) -> None:
+        if self._server == None: return
+        self._server.shutdown()
+        if self._thread != None: self._thread.join()
+        self._close()
+
+    def _listen(self) -> None:
+        #a socket left by a crashed service is removed, one a running service answers on isn't
+        if self._socketPath.exists():
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(str(self._socketPath))
+            except OSError:
+                self._socketPath.unlink(missing_ok=True)
+            else:
+                raise ECalServiceError(f"An ECal service is already running on {self._socketPath}.")
+            finally:
+                probe.close()
+        self._server = _ECalServiceServer(str(self._socketPath), _ECalServiceHandler)
+        self._server.service = self
+        #only this user may talk to the modules
+        os.chmod(self._socketPath, 0o600)
+
+    def _close(self) -> None:
+        self._server.server_close()
+        self._socketPath.unlink(missing_ok=True)
+        with self._lock:
+            for module in self._modules.values(): module.ecal.hal.close()
+            self._modules.clear()
+        self._server = None
+
+
+    def _handle(self, request: dict) -> any:
+        op = request["op"]
+        if op == "modules": return self.modules
+
+        module = self._module(request["serialNo"])
+        with module.lock:
+            ecal = module.ecal
+            if op == "metadata":
+                return ecal._metadata()
+            if op == "read":
+                return base64.b64encode(ecal.readBytesFromFlash(request["addr"], request["length"])).decode()
+            if op == "setGates":
+                ecal.setGates(request["value"])
+                return None
+            if op == "isolate":
+                ecal.isolate()
+                return None
+            if op == "write":
+                #gate latches written around the control object, forgotten even if the write fails
+                ecal._forgetGates()
+                ecal.hal._writeByte(request["addr"], request["value"])
+                return None
+            if op == "reset":
+                ecal._reset()
+                return None
+        raise ECalServiceError(f"Unknown request {op}.")
+
+
+
+class ECalHalService(ECalHal):
+    '''
+    HAL forwarding to a module served by ECalService
+    '''
+
+    #the service answers from memory, large blocks cost a single round trip
+    _MAX_BLOCK_LENGTH = 0x10000
+
+    def __init__(self, serialNo: str, socketPath: Path = None) -> None:
+        self._serialNo = serialNo
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(str(socketPath if socketPath != None else defaultSocketPath()))
+        self._lock = threading.Lock()
+
+    def __del__(self) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._socket != None: self._socket.close()
+        self._socket = None
+
+
+    def _request(self, op: str, **args) -> any:
+        with self._lock:
+            _sendMessage(self._socket, dict(args, op=op, serialNo=self._serialNo))
+            response = _receiveMessage(self._socket)
+        if not response["ok"]: raise ECalServiceError(response["error"])
+        return response["result"]
+
+
+    def _writeByte(self, addr: int, value: int) -> None:
+        self._request("write", addr=addr, value=value)
+
+    def _reset(self) -> None:
+        self._request("reset")
+
+    def _readByteFromFlash(self, addr: int) -> int:
+        return self._readBlockFromFlash(addr, 1)[0]
+
+    def _readBlockFromFlash(self, addr: int, length: int) -> bytes:
+        return base64.b64decode(self._request("read", addr=addr, length=length))
+
+
+
+class ECalServiceClient(ECalControl):
+    '''
+    ECal control object for a module served by ECalService.
+    Metadata comes from the service in one request, gates are switched by the service,
+    which keeps track of them for all its clients. Flash reads are served from the service's memory.
+    '''
+
+    def __init__(self, serialNo: str, socketPath: Path = None, **kwargs) -> None:
+        super().__init__(ECalHalService(serialNo, socketPath), **kwargs)
+
+
+    def _ensureInfo(self) -> None:
+        if self._infoRead: return
+        with self._operation("ECalServiceClient.metadata"):
+            self._applyMetadata(self.hal._request("metadata"))
+        self._infoRead = True
+
+    def setGates(self, value: int) -> None:
+        self.hal._request("setGates", value=value)
+
+    def switchTo(self, standard: ECalStandardAbc) -> None:
+        self.setGates(standard.id)
+
+    def isolate(self) -> None:
+        self.hal._request("isolate")
+
+    @property
+    def gates(self) -> int:
+        '''Gates are tracked by the service'''
+        return None
+
+    def _reset(self) -> None:
+        self.hal._reset()
+        self._flashCache.invalidate()
+
+
+try:
+    from .ecalControlSkrf import ECalControlSk
+
+    class ECalServiceClientSk(ECalServiceClient, ECalControlSk):
+        '''ECalServiceClient with scikit-rf correction sets and standards'''
+        pass
+except ImportError:
+    pass
+
+
+
+if __name__ == "__main__":
+    service = ECalService()
+    print(f"ECal service listening on {service.socketPath}")
+    service.serveForever()
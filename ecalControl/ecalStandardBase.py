@@ -1,3 +1,5 @@
+import numpy as np
+
 from .abstract import ECalHalAbc
 from .abstract import ECalControlAbc
 from .abstract import ECalCorrectionSetAbc
@@ -16,24 +18,35 @@ class ECalStandard(ECalStandardAbc):
         self._indexInEEPROM = index
 
     def activate(self) -> None:
-        self._set.ecal.setGates(self._id)
+        self._set.ecal.switchTo(self)
 
     @property
     def id(self) -> int:
         return self._id
 
 
-    def fetchDataFromEEPROM(self):
+    @property
+    def dataAddrInEEPROM(self) -> int:
+        return self._set.dataAddrInEEPROM + self._indexInEEPROM * self.dataLengthInEEPROM
+
+    @property
+    def dataLengthInEEPROM(self) -> int:
+        return self._set.paramsPerPointPerStandard * self._set.ecal.numFrequencies * 8
+
+
+    def decodeDataFromEEPROM(self, buffer: bytes) -> np.ndarray:
+        '''Decodes the standard's raw data block into an array of shape (frequencies, ports, ports)
+        The block holds one trace of complex64 values per s-parameter, s-parameters in row major order'''
         numFrequencies = self._set.ecal.numFrequencies
+        numPorts = self._set.numPorts
 
-        baseAddress = self._set.dataAddrInEEPROM + self._indexInEEPROM * self._set.paramsPerPointPerStandard * numFrequencies * 8
+        traces = np.frombuffer(buffer, dtype="<c8", count=numPorts * numPorts * numFrequencies)
+        return np.ascontiguousarray(traces.reshape(numPorts * numPorts, numFrequencies).T).reshape(numFrequencies, numPorts, numPorts)
 
-        table = []
-        for i in range(numFrequencies):
-            row = []
-            for j in range((self._set.numPorts)**2):
-                real, imag = self._set.ecal.readValueFromFlash(baseAddress + j*numFrequencies*8 + i*8,'f') , self._set.ecal.readValueFromFlash(baseAddress + j*numFrequencies*8 + i*8 + 4,'f')
-                row.append(complex(real, imag))
-            table.append(row)
 
-        return table
\ No newline at end of file
+    def fetchDataFromEEPROM(self, buffer: bytes = None) -> np.ndarray:
+        '''Reads and decodes the standard's data, or decodes a data block already read (e.g. by a download job)'''
+        with self._set.ecal._operation("ECalStandard.fetchDataFromEEPROM"):
+            if buffer == None:
+                buffer = self._set.ecal.readBytesFromFlash(self.dataAddrInEEPROM, self.dataLengthInEEPROM)
+            return self.decodeDataFromEEPROM(buffer)
@@ -0,0 +1,256 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+from skrf import Network
+
+from .abstract import CorrectionSetScope
+
+
+class ECalStandardCache():
+    '''
+    Binary cache of a module's standards characterization, one file per module next to its touchstone files.
+    Holds the frequency vectors and every standard's s-parameters as complex64 with an index,
+    and is memory mapped instead of parsing the touchstone text files, so processes using the same module share its pages.
+    Rebuilt when a touchstone file is added, removed or changed; a changed modification time alone
+    only triggers a hash check of that file.
+    '''
+
+    _MAGIC = b"ECALSTD\x01"
+    _ALIGNMENT = 16
+    _STANDARD_FILE_PATTERN = re.compile(r"ECal (\S+) s_n (\S+) set (\S+) std 0x([0-9a-fA-F]+)\.s(\d)p")
+
+    def __init__(self, model: str, serialNo: str, folder: Path) -> None:
+        self._model = model
+        self._serialNo = serialNo
+        self._folder = Path(folder)
+
+        self._index : dict[tuple[CorrectionSetScope, int], dict] = None
+        self._frequencies : list[np.ndarray] = []
+        self._data : memoryview | bytes = None
+        self._lock = threading.Lock()
+
+
+    @property
+    def cachePath(self) -> Path:
+        return self._folder.joinpath("ECal " + self._model + " s_n " + self._serialNo + " standards.bin")
+
+
+    def load(self) -> None:
+        '''Maps the cache, rebuilding it first if the touchstone files changed'''
+        with self._lock:
+            sources = self._sources()
+            header, data = self._read()
+            current, touched = self._isCurrent(header, sources) if header != None else (False, False)
+            if not current:
+                header, data = self._build(sources)
+            if (not current) or touched:
+                try:
+                    self._write(header, data)
+                    header, data = self._read()
+                except OSError:
+                    #read-only data folder, keep it in memory
+                    pass
+            self._apply(header, data)
+
+    def _ensureLoaded(self) -> None:
+        if self._index == None: self.load()
+
+    def invalidate(self) -> None:
+        '''Reloads (and checks the touchstone files) on next access'''
+        with self._lock:
+            self._index = None
+            self._frequencies = []
+            #views handed out keep the old mapping alive
+            self._data = None
+
+
+    def sParameters(self, scope: CorrectionSetScope, id: int) -> np.ndarray | None:
+        '''s-parameters of shape (frequencies, ports, ports), a read-only view into the mapped cache'''
+        self._ensureLoaded()
+        entry = self._index.get((scope, id))
+        if entry == None: return None
+        ports = entry["ports"]
+        return np.frombuffer(self._data, dtype="<c8", count=entry["count"] * ports * ports, offset=entry["offset"]).reshape(entry["count"], ports, ports)
+
+    def frequencies(self, scope: CorrectionSetScope, id: int) -> np.ndarray | None:
+        self._ensureLoaded()
+        entry = self._index.get((scope, id))
+        if entry == None: return None
+        return self._frequencies[entry["frequencies"]]
+
+    def network(self, scope: CorrectionSetScope, id: int) -> Network | None:
+        self._ensureLoaded()
+        entry = self._index.get((scope, id))
+        if entry == None: return None
+        return Network(f=self.frequencies(scope, id), s=self.sParameters(scope, id).copy(), f_unit="Hz", name=entry["name"])
+
+    def standards(self) -> list[tuple[CorrectionSetScope, int]]:
+        self._ensureLoaded()
+        return list(self._index)
+
+
+    def _sources(self) -> dict[str, Path]:
+        sources = dict()
+        for path in self._folder.glob("ECal " + self._model + " s_n " + self._serialNo + " set *.s?p"):
+            m = ECalStandardCache._STANDARD_FILE_PATTERN.fullmatch(path.name)
+            if (m != None) and (m[1] == self._model) and (m[2] == self._serialNo): sources[path.name] = path
+        return sources
+
+    def _fileHash(path: Path) -> str:
+        return hashlib.sha1(path.read_bytes()).hexdigest()
+
+    def _isCurrent(self, header: dict, sources: dict[str, Path]) -> tuple[bool, bool]:
+        '''(cache matches the touchstone files, modification times were updated in the header)'''
+        recorded = header["sources"]
+        if set(recorded) != set(sources): return False, False
+        touched = False
+        for name, path in sources.items():
+            stat = path.stat()
+            entry = recorded[name]
+            if (entry["mtime"] == stat.st_mtime_ns) & (entry["size"] == stat.st_size): continue
+            #touched, but maybe not changed
+            if entry["sha1"] != ECalStandardCache._fileHash(path): return False, False
+            entry["mtime"] = stat.st_mtime_ns
+            touched = True
+        return True, touched
+
+
+    def _build(self, sources: dict[str, Path]) -> tuple[dict, bytes]:
+        header = {"model": self._model, "serialNo": self._serialNo, "sources": dict(), "frequencies": [], "standards": []}
+        data = bytearray()
+
+        def append(array: np.ndarray) -> int:
+            data.extend(bytes(-len(data) % ECalStandardCache._ALIGNMENT))
+            offset = len(data)
+            data.extend(array.tobytes())
+            return offset
+
+        frequencies : list[np.ndarray] = []
+        for name, path in sorted(sources.items()):
+            stat = path.stat()
+            header["sources"][name] = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "sha1": ECalStandardCache._fileHash(path)}
+
+            nwk = Network(str(path))
+            f = np.asarray(nwk.f, dtype="<f8")
+            fIndex = next((i for i, known in enumerate(frequencies) if np.array_equal(known, f)), None)
+            if fIndex == None:
+                fIndex = len(frequencies)
+                frequencies.append(f)
+                header["frequencies"].append({"offset": append(f), "count": len(f)})
+
+            m = ECalStandardCache._STANDARD_FILE_PATTERN.fullmatch(name)
+            header["standards"].append({"scope": m[3], "id": int(m[4], 16), "name": path.stem, "ports": nwk.nports,
+                                        "frequencies": fIndex, "count": len(f), "offset": append(nwk.s.astype("<c8"))})
+
+        return header, bytes(data)
+
+
+    def _read(self) -> tuple[dict, memoryview] | tuple[None, None]:
+        try:
+            with open(self.cachePath, "rb") as f:
+                content = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except (OSError, ValueError):
+            return None, None
+        if content[:len(ECalStandardCache._MAGIC)] != ECalStandardCache._MAGIC: return None, None
+
+        headerLength = struct.unpack_from("<I", content, len(ECalStandardCache._MAGIC))[0]
+        headerStart = len(ECalStandardCache._MAGIC) + 4
+        try:
+            header = json.loads(bytes(content[headerStart:headerStart + headerLength]))
+        except ValueError:
+            return None, None
+        dataStart = headerStart + headerLength
+        dataStart += -dataStart % ECalStandardCache._ALIGNMENT
+        return header, content[dataStart:]
+
+    def _write(self, header: dict, data: bytes) -> None:
+        headerBytes = json.dumps(header).encode()
+        prefix = ECalStandardCache._MAGIC + struct.pack("<I", len(headerBytes)) + headerBytes
+        prefix += bytes(-len(prefix) % ECalStandardCache._ALIGNMENT)
+
+        #processes sharing the cache may rebuild it at the same time, each writes its own temp file
+        with tempfile.NamedTemporaryFile(dir=self._folder, prefix=self.cachePath.stem + ".", suffix=".tmp", delete=False) as f:
+            tempPath = Path(f.name)
+        try:
+            with open(tempPath, "wb") as f:
+                f.write(prefix + data)
+            #temp files are private, the cache is as readable as the touchstone files
+            os.chmod(tempPath, 0o644)
+            tempPath.replace(self.cachePath)
+        except:
+            tempPath.unlink(missing_ok=True)
+            raise
+
+    def _apply(self, header: dict, data: bytes) -> None:
+        self._data = data
+        self._frequencies = [np.frombuffer(data, dtype="<f8", count=entry["count"], offset=entry["offset"]) for entry in header["frequencies"]]
+        self._index = {(CorrectionSetScope[entry["scope"]], entry["id"]): entry for entry in header["standards"]}
+
+
+
+class ECalStandardStore():
+    '''
+    Read-only standard data of all modules in a data folder, keyed by (model, serial number, scope, standard id).
+    Backed by the modules' memory mapped ECalStandardCache files, so the data is paid for once per host
+    in the page cache and every process attaching to it gets zero-copy numpy views.
+    '''
+
+    _stores : dict[Path, 'ECalStandardStore'] = dict()
+    _storesLock = threading.Lock()
+
+    def __init__(self, folder: Path = None) -> None:
+        if folder == None:
+            folder = Path(__file__).parent.resolve().joinpath("data")
+        self._folder = Path(folder)
+        self._caches : dict[tuple[str, str], ECalStandardCache] = dict()
+        self._lock = threading.Lock()
+
+
+    def shared(folder: Path = None) -> 'ECalStandardStore':
+        '''The process wide store of a data folder'''
+        if folder == None:
+            folder = Path(__file__).parent.resolve().joinpath("data")
+        folder = Path(folder).resolve()
+        with ECalStandardStore._storesLock:
+            store = ECalStandardStore._stores.get(folder)
+            if store == None:
+                store = ECalStandardStore(folder)
+                ECalStandardStore._stores[folder] = store
+            return store
+
+
+    @property
+    def folder(self) -> Path:
+        return self._folder
+
+    def cache(self, model: str, serialNo: str) -> ECalStandardCache:
+        with self._lock:
+            cache = self._caches.get((model, serialNo))
+            if cache == None:
+                cache = ECalStandardCache(model, serialNo, self._folder)
+                self._caches[(model, serialNo)] = cache
+            return cache
+
+
+    def view(self, model: str, serialNo: str, scope: CorrectionSetScope, id: int) -> np.ndarray | None:
+        '''s-parameters of shape (frequencies, ports, ports) as a read-only view, None if the standard isn't stored'''
+        return self.cache(model, serialNo).sParameters(scope, id)
+
+    def frequencies(self, model: str, serialNo: str, scope: CorrectionSetScope, id: int) -> np.ndarray | None:
+        return self.cache(model, serialNo).frequencies(scope, id)
+
+    def __getitem__(self, key: tuple[str, str, CorrectionSetScope, int]) -> np.ndarray:
+        s = self.view(*key)
+        if s is None: raise KeyError(key)
+        return s
+
+    def __contains__(self, key: tuple[str, str, CorrectionSetScope, int]) -> bool:
+        return self.view(*key) is not None
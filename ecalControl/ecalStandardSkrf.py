@@ -14,17 +14,26 @@ class ECalStandardSk(ECalStandard):
         
     def __init__(self, set: "ECalCorrectionSetAbc", id: int, index: int) -> None:
         super().__init__(set, id, index)
-        self.fetchDataFromTouchstoneFile()
+        #touchstone file is parsed on first access of network
+        self._network : Network = None
+        self._networkLoaded = False
+        #network built from the standard cache, whose data can be viewed without copies
+        self._networkCached = False
 
-    def fetchDataFromEEPROM(self) -> Network:
-        table = super().fetchDataFromEEPROM()
+    def fetchDataFromEEPROM(self, buffer: bytes = None) -> Network:
+        s = super().fetchDataFromEEPROM(buffer)
 
         freq = Frequency.from_f(self._set.ecal.frequencyList)           
-        s = np.stack([ np.reshape(row, (self._set.numPorts, self._set.numPorts)) for row in table])
         self._network = Network(f=freq.f, s=s)
+        self._networkLoaded = True
+        self._networkCached = False
+        self._set._invalidateStacked()
         return self._network
 
     def fetchDataFromTouchstoneFile(self, explicitFilePath: Path = None) -> Network:
+        self._networkLoaded = True
+        self._networkCached = False
+        self._set._invalidateStacked()
         try:
             if explicitFilePath != None:
                 self._network = Network(str(explicitFilePath))
@@ -51,6 +60,7 @@ class ECalStandardSk(ECalStandard):
             path.rename(backup)
 
         self._network.write_touchstone(filename=str(path.stem), dir=str(path.parent))
+        if explicitFilePath == None: self._set.ecal.standardCache.invalidate()
 
     @property
     def _touchstoneFilePath(self) -> Path:
@@ -61,12 +71,44 @@ class ECalStandardSk(ECalStandard):
 
         return self._set.ecal.dataFolderPath.joinpath(fileName)
 
+    @property
+    def name(self) -> str:
+        '''Name of the standard's touchstone file, without extension'''
+        return self._touchstoneFilePath.stem
+
     @property
     def network(self) -> Network:
-        if self._network == None:
+        if not self._networkLoaded:
+            #from the module's binary standard cache, the touchstone file itself if the cache can't be built
             try:
-                self._network = self.fetchDataFromTouchstoneFile(self._set.ecal.dataFolderPath)
-            except:
-                return None
+                self._network = self._set.ecal.standardCache.network(self._set.scope, self._id)
+                self._networkLoaded = True
+                self._networkCached = True
+            except Exception:
+                self.fetchDataFromTouchstoneFile()
         return self._network
-    
\ No newline at end of file
+
+    @property
+    def sParameters(self) -> np.ndarray:
+        '''s-parameters of shape (frequencies, ports, ports).
+        A read-only view into the shared standard cache unless the data was read from flash or another file.'''
+        if (not self._networkLoaded) or self._networkCached:
+            try:
+                s = self._set.ecal.standardCache.sParameters(self._set.scope, self._id)
+                if s is not None: return s
+            except Exception:
+                pass
+        network = self.network
+        return network.s if network != None else None
+
+    @property
+    def frequencies(self) -> np.ndarray:
+        '''Frequencies in Hz of sParameters'''
+        if (not self._networkLoaded) or self._networkCached:
+            try:
+                f = self._set.ecal.standardCache.frequencies(self._set.scope, self._id)
+                if f is not None: return f
+            except Exception:
+                pass
+        network = self.network
+        return network.f if network != None else None
@@ -0,0 +1,157 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List
+
+from .abstract import ECalControlAbc
+from .abstract import CorrectionSetScope
+
+
+@dataclass(frozen=True)
+class ECalPreparationStatus:
+    serialNo: str
+    step: str
+    warmupRemaining: float
+    prepared: bool
+    error: Exception = None
+
+    @property
+    def ready(self) -> bool:
+        return self.prepared & (self.error == None) & (self.warmupRemaining <= 0)
+
+    def __str__(self) -> str:
+        if self.error != None: return f"{self.serialNo}: preparation failed - {self.error}"
+        if self.ready: return f"{self.serialNo}: ready"
+        return f"{self.serialNo}: {self.step}, warm-up {self.warmupRemaining:.0f}s remaining"
+
+
+class ECalWarmupScheduler():
+    '''
+    Starts the module's warm-up timer and meanwhile prepares it in a background thread:
+    info block (validated against the metadata cache if the ECal has one), correction set headers,
+    characterization download if touchstone files are missing, and the standards' data loaded for use.
+    Ready once both the warm-up time has passed and the preparation is done.
+    Leave the module alone until the preparation is done, the HALs aren't thread safe.
+    '''
+
+    #the info block's warm-up time is in minutes
+    _WARMUP_UNIT = 60
+
+    def __init__(self,
+                 ecal: ECalControlAbc,
+                 warmupSeconds: float = None,
+                 scopes: List[CorrectionSetScope] = None,
+                 download: bool | str = "missing",
+                 progress: Callable[[ECalPreparationStatus], None] = None) -> None:
+        '''warmupSeconds defaults to the module's own warm-up time.
+        download is True, False or "missing" to download the characterization only if touchstone files are missing.'''
+
+        self._ecal = ecal
+        self._warmupSeconds = warmupSeconds
+        self._scopes = scopes if scopes != None else list(CorrectionSetScope)
+        self._download = download
+        self._progress = progress
+
+        self._serialNo = ""
+        self._startTime : float = None
+        self._thread : threading.Thread = None
+        self._prepared = threading.Event()
+        self._step = "not started"
+        self._error : Exception = None
+        self._data : dict[CorrectionSetScope, dict[int, any]] = None
+
+
+    def start(self) -> 'ECalWarmupScheduler':
+        if self._thread != None: return self
+        self._startTime = time.monotonic()
+        self._thread = threading.Thread(target=self._prepare, name="ECalPrepare", daemon=True)
+        self._thread.start()
+        return self
+
+
+    @property
+    def status(self) -> ECalPreparationStatus:
+        return ECalPreparationStatus(self._serialNo, self._step, self.warmupRemaining, self._prepared.is_set(), self._error)
+
+    @property
+    def warmupRemaining(self) -> float:
+        '''Seconds of warm-up left, infinite until started and the warm-up time is known'''
+        if (self._startTime == None) or (self._warmupSeconds == None): return float("inf")
+        return max(0.0, self._warmupSeconds - (time.monotonic() - self._startTime))
+
+    @property
+    def ready(self) -> bool:
+        return self.status.ready
+
+    @property
+    def data(self) -> dict[CorrectionSetScope, dict[int, any]]:
+        '''Standards' data read from flash for ECals without touchstone support, None otherwise'''
+        return self._data
+
+
+    def wait(self, timeout: float = None) -> bool:
+        '''Blocks until ready, re-raises a preparation error. Returns False if the timeout passed first.'''
+        deadline = time.monotonic() + timeout if timeout != None else None
+        if not self._prepared.wait(timeout): return False
+        if self._error != None: raise self._error
+
+        remaining = self.warmupRemaining
+        if deadline != None:
+            if time.monotonic() + remaining > deadline:
+                time.sleep(max(0.0, deadline - time.monotonic()))
+                return False
+        time.sleep(remaining)
+        return True
+
+
+    def _setStep(self, step: str) -> None:
+        self._step = step
+        if self._progress != None: self._progress(self.status)
+
+    def _prepare(self) -> None:
+        try:
+            self._setStep("reading module info")
+            self._serialNo = self._ecal.serialNo
+            if self._warmupSeconds == None:
+                self._warmupSeconds = self._ecal.warmupTime * ECalWarmupScheduler._WARMUP_UNIT
+
+            self._setStep("reading correction set headers")
+            self._ecal.loadHeaders()
+
+            if hasattr(self._ecal, "prefetch"):
+                self._setStep("loading touchstone files")
+                self._ecal.prefetch(self._scopes)
+
+            downloadScopes = self._downloadScopes()
+            if len(downloadScopes) > 0:
+                self._setStep("downloading characterization")
+                self._ecal.downloadCharacterization(scopes=downloadScopes)
+
+            self._setStep("loading standards")
+            self._loadStandards()
+
+            self._step = "warming up"
+        except Exception as e:
+            self._error = e
+        finally:
+            self._prepared.set()
+            if self._progress != None: self._progress(self.status)
+
+
+    def _scopesMissingTouchstone(self) -> List[CorrectionSetScope]:
+        return [scope for scope in self._scopes 
+                if any(hasattr(std, "network") and (std.network == None) for std in self._ecal.correctionSets[scope])]
+
+    def _downloadScopes(self) -> List[CorrectionSetScope]:
+        '''Sets to download, only the scheduler's own'''
+        if self._download == "missing": return self._scopesMissingTouchstone()
+        return list(self._scopes) if self._download else []
+
+    def _loadStandards(self) -> None:
+        hasTouchstone = all(hasattr(std, "network") for scope in self._scopes for std in self._ecal.correctionSets[scope])
+        if hasTouchstone:
+            #touchstone files are parsed by now, sets with a file still missing come from flash
+            missing = self._scopesMissingTouchstone()
+            if len(missing) > 0: self._ecal.fetchCorrectionSets(missing)
+        else:
+            self._data = self._ecal.fetchCorrectionSets(self._scopes)
@@ -0,0 +1,27 @@
+from pathlib import Path
+from ecalControl import ECalBenchmark
+from ecalControl import ECalHalSim, ECalLatencyProfile
+from ecalControl import ECalControlSk
+
+
+recordsPath = Path(__file__).parent.resolve().joinpath("ecalBenchmark.jsonl")
+
+#emulated adapters, swap in ECalHalFtdi / ECalHalCamino to measure the real hardware
+for latency in [ECalLatencyProfile.FTDI, ECalLatencyProfile.CAMINO]:
+    hal = ECalHalSim("85093-60005", "00475", latency=latency)
+    benchmark = ECalBenchmark(hal, label=latency.name, ecalType=ECalControlSk)
+    for result in benchmark.run():
+        print(result)
+    benchmark.writeRecords(recordsPath)
+
+#speedup of the Camino adapter over the FTDI one, per benchmark
+records = ECalBenchmark.readRecords(recordsPath)
+latest = {(r["label"], r["benchmark"]): r for r in records}
+for name in ECalBenchmark.BENCHMARKS:
+    ftdi = latest[("ftdi", name)]
+    camino = latest[("camino", name)]
+    if ftdi["seconds"] > 0 and camino["seconds"] > 0:
+        print(f"{name}: Camino {ftdi['seconds'] / camino['seconds']:.1f} times faster")
+
+
+print("All done")
@@ -0,0 +1,71 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from ecalControl import ECalHalSim
+from ecalControl import ECalControl, ECalDownloadJob
+
+
+class InterruptedHalSim(ECalHalSim):
+    '''Emulated module recording its block reads, failing once readsLeft reached zero'''
+    readsLeft : int = None
+
+    def _readBlockFromFlash(self, addr: int, length: int) -> bytes:
+        if self.readsLeft != None:
+            if self.readsLeft == 0: raise IOError("Injected connection loss")
+            self.readsLeft -= 1
+        self.reads.append((addr, length))
+        return super()._readBlockFromFlash(addr, length)
+
+
+hal = InterruptedHalSim("85093-60005", "00475")
+hal.reads = []
+ecal = ECalControl(hal)
+
+with tempfile.TemporaryDirectory() as folder:
+    chunkLength = 4096
+
+    #first run loses the connection part way through, reads of the set headers by the job's constructor don't count
+    job = ECalDownloadJob(ecal, folder, chunkLength=chunkLength)
+    hal.reads.clear()
+    hal.readsLeft = 10
+    try:
+        job.run()
+        assert False, "interruption not raised"
+    except IOError as e:
+        print(f"first run stopped after {len(hal.reads)} chunk(s): {e}")
+    firstReads = set(hal.reads)
+    assert len(firstReads) == 10
+
+    #resuming reads only the chunks the first run didn't get
+    job = ECalDownloadJob(ecal, folder, chunkLength=chunkLength)
+    hal.reads.clear()
+    hal.readsLeft = None
+    decoded = job.run()
+    print(f"resumed run read {len(hal.reads)} chunk(s)")
+    assert job.isComplete
+    assert firstReads.isdisjoint(hal.reads)
+
+    #together the runs read each standard's data exactly once
+    expected = []
+    for std in job._standards.values():
+        for offset in range(0, std.dataLengthInEEPROM, chunkLength):
+            expected.append((std.dataAddrInEEPROM + offset, min(chunkLength, std.dataLengthInEEPROM - offset)))
+    assert sorted(firstReads | set(hal.reads)) == sorted(expected)
+
+    #the data is returned and, as plain standards aren't saved elsewhere, kept on disk
+    assert len(decoded) == len(job._standards)
+    for key, std in job._standards.items():
+        assert np.array_equal(decoded[key], std.decodeDataFromEEPROM(hal.flashImage[std.dataAddrInEEPROM:std.dataAddrInEEPROM + std.dataLengthInEEPROM]))
+    assert job._dataPath.exists() & job._sidecarPath.exists()
+    print(f"{len(decoded)} standard(s) decoded, data kept in {Path(job._dataPath).name}")
+
+    #a further run has nothing left to read
+    job = ECalDownloadJob(ecal, folder, chunkLength=chunkLength)
+    hal.reads.clear()
+    assert len(job.run()) == len(decoded)
+    assert len(hal.reads) == 0
+
+
+print("All done")
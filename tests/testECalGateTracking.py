@@ -0,0 +1,49 @@
+from ecalControl import ECalHalSim, ECalHal
+from ecalControl import ECalControl, CorrectionSetScope
+
+
+class FlakyHalSim(ECalHalSim):
+    '''Emulated module whose next write to the given latch fails'''
+    failAddr : int = None
+
+    def _writeByte(self, addr: int, value: int) -> None:
+        if addr == self.failAddr:
+            self.failAddr = None
+            raise IOError(f"Injected write failure at latch {addr}")
+        super()._writeByte(addr, value)
+
+
+hal = FlakyHalSim("85093-60005", "00475")
+ecal = ECalControl(hal)
+first, second = ecal.correctionSets[CorrectionSetScope.PORT_A].standards[:2]
+
+ecal.switchTo(first)
+assert hal.gates == first.id
+print(f"gates 0x{hal.gates:04x} after switching to 0x{first.id:04x}")
+
+#switch to a standard differing in both gate bytes, the high byte write fails
+target = first.id ^ 0x0101
+hal.failAddr = ECalHal._MUX_ADDR_GATES_9_16
+try:
+    ecal.setGates(target)
+    assert False, "write failure not raised"
+except IOError as e:
+    print(f"setGates(0x{target:04x}) failed: {e}")
+print(f"latched 0x{hal.gates:04x}, tracked {ecal.gates}")
+assert ecal.gates == None
+
+#going back must rewrite the latches instead of assuming they still hold the old word
+ecal.switchTo(first)
+assert hal.gates == first.id
+print(f"gates 0x{hal.gates:04x} after switching back to 0x{first.id:04x}")
+
+#a reset clears the latches, tracking must not survive it
+ecal.switchTo(second)
+ecal._reset()
+assert (hal.gates == 0) & (ecal.gates == None)
+ecal.switchTo(second)
+assert hal.gates == second.id
+print(f"gates 0x{hal.gates:04x} after reset and switching to 0x{second.id:04x}")
+
+
+print("All done")
@@ -0,0 +1,32 @@
+from ecalControl import ECalHalSim, ECalLatencyProfile
+from ecalControl import ECalControlSk
+import numpy as np
+
+
+
+#emulated modules built from the characterization data in ecalControl/data, no hardware needed
+for model, serialNo in [("85062-60002", "01903"), ("85093-60005", "00475")]:
+    for latency in [ECalLatencyProfile.FTDI, ECalLatencyProfile.CAMINO]:
+
+        hal = ECalHalSim(model, serialNo, latency=latency)
+        ecal = ECalControlSk(hal)
+        print(f"{ecal.model} s_n {ecal.serialNo} {ecal.connectorType} on {latency.name}: open {hal.elapsedTime:.2f}s simulated, {hal.transactions} transactions")
+
+        #flash content must decode to the touchstone data it was built from
+        hal.resetCounters()
+        for csk in ecal.correctionSets:
+            for std in ecal.correctionSets[csk]:
+                fromFile = std.network.s
+                fromFlash = std.fetchDataFromEEPROM().s
+                if not np.allclose(fromFile, fromFlash, atol=1e-6):
+                    print(f"   mismatch in {csk.name} 0x{std.id:04x}")
+        print(f"   all standards {hal.elapsedTime:.2f}s simulated, {hal.bytesRead} bytes")
+
+        #gate state follows the latches
+        std = next(iter(ecal.correctionSets[csk]))
+        std.activate()
+        print(f"   gates 0x{hal.gates:04x} after activating 0x{std.id:04x}")
+
+
+
+print("All done")
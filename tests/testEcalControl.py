@@ -1,8 +1,6 @@
 from ecalControl import ECalHalFtdi
 from ecalControl import ECalHalCamino
 from ecalControl import ECalControlSk
-from ecalControl import ECalStandardSk
-from ecalControl import CorrectionSetScope as scope
 
 
 
@@ -15,16 +13,8 @@ try:
 
 
     #fetch and save characterization data 
-    #can take a long time using FTDI based HAL
-    std : ECalStandardSk
-    csk : scope
-    for csk in ecal.correctionSets:
-        cs = ecal.correctionSets[csk]
-        print(cs.scope.name)
-        for std in cs:
-            print("   " + str(std._touchstoneFilePath))
-            std.fetchDataFromEEPROM()
-            std.saveDataToTouchstoneFile()
+    #can take a long time using FTDI based HAL, an interrupted download resumes where it stopped
+    ecal.downloadCharacterization(progress=print)
     
 
     print("All done")
@@ -0,0 +1,47 @@
+from ecalControl import ECalHalSim
+from ecalControl import ECalControlSk, CorrectionSetScope
+from vnaCalWizard import IdealStandardCache
+import skrf as rf
+import numpy as np
+
+
+
+#characterization data of an emulated module, resampled onto VNA grids the way the wizard does it
+ecal = ECalControlSk(ECalHalSim("85093-60005", "00475"))
+cache = IdealStandardCache()
+
+f = ecal.correctionSets[CorrectionSetScope.PORT_A].frequencies
+grids = {"characterization": rf.Frequency.from_f(f, unit="Hz"),
+         "inside": rf.Frequency(f[0] + 1e6, f[-1] - 1e6, 401, unit="Hz"),
+         "below": rf.Frequency(0.5 * f[0], f[len(f) // 2], 201, unit="Hz"),
+         "beyond": rf.Frequency(f[len(f) // 2], 1.5 * f[-1], 801, unit="Hz")}
+
+for scope in [CorrectionSetScope.PORT_A, CorrectionSetScope.THRU_AB]:
+    correctionSet = ecal.correctionSets[scope]
+    for gridName, grid in grids.items():
+        op, ideals = cache.ideals(ecal, scope, grid)
+        assert len(ideals) == len(correctionSet.standards)
+
+        worst = 0.0
+        for std, ideal in zip(correctionSet.standards, ideals):
+            nports = std.network.nports
+            measured = rf.Network(frequency=grid, s=np.zeros((len(grid.f), nports, nports), dtype=complex))
+            m, s = rf.network.overlap(measured, std.network)
+
+            #same points picked from the measurement, same resampled data
+            assert np.array_equal(measured[op.mask].f, m.f)
+            assert np.array_equal(ideal.f, s.f)
+            assert ideal.s.shape == s.s.shape
+            worst = max(worst, np.abs(ideal.s - s.s).max())
+        assert worst < 1e-9
+        print(f"{scope.name} on {gridName} grid: {op.mask.sum()}/{len(grid.f)} points covered, max deviation from overlap {worst:.1e}")
+
+    #repeated calls are served from the cache, with networks free to be modified
+    op, ideals = cache.ideals(ecal, scope, grids["below"])
+    again, idealsAgain = cache.ideals(ecal, scope, grids["below"])
+    assert (again is op) & (idealsAgain[0] is not ideals[0])
+    ideals[0].s[:] = 0
+    assert np.array_equal(idealsAgain[0].s, cache.ideals(ecal, scope, grids["below"])[1][0].s)
+
+
+print("All done")
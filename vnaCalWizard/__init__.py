@@ -1,2 +1,3 @@
 from .calableVna import CalableVna
 from .calWizard import VnaCalWizard, FrequencyEx
+from .idealStandardCache import IdealStandardCache, InterpolationOperator
@@ -1,4 +1,5 @@
 from . import CalableVna
+from .idealStandardCache import IdealStandardCache
 from ecalControl import ECalControlSk
 from ecalControl import ECalStandardSk
 from ecalControl import CorrectionSetScope as scope
@@ -191,12 +192,15 @@ class VnaCalWizard():
                  vnaPorts : dict[int, RfPort],
                  ecals : List[ECalControlSk],
                  adapters : List[RfAdapter] = None, 
-                 operatorPrompt : Callable = None) -> None:
+                 operatorPrompt : Callable = None,
+                 idealCache : IdealStandardCache = None) -> None:
         
         self._vna = vna
         self._vnaPorts = vnaPorts
         self._ecals = ecals
         self._adapters = adapters
+        #standards' characterization resampled onto the vna frequency grid, reused across calibrations
+        self._idealCache = idealCache if idealCache != None else IdealStandardCache()
 
         if operatorPrompt == None:
             if self._vna.operatorPrompt == None:
@@ -249,14 +253,19 @@ class VnaCalWizard():
         idealStds: List[Network] = []
 
         #measure all one port standards on the connected ECal port
+        setScope : scope = vnaToEcalPortMap[vnaPort].value
+        ideals : List[Network] = None
         standard : ECalStandardSk
-        for standard in ecal.correctionSets[vnaToEcalPortMap[vnaPort].value]:
+        for i, standard in enumerate(ecal.correctionSets[setScope]):
             standard.activate()
             #get one port reading from vna, cropped to frequency subset (if given)
             measured = self._vna.get_network([vnaPort]).cropped(f.start, f.stop)
             
-            #get s-parameter data subset within frequency overlap between standard characterization data and measured (and cropped) data
-            m, s = rf.network.overlap(measured, standard.network)
+            #standard characterization data resampled onto the measured frequencies within their overlap, 
+            #all standards of the set at once and cached for further calibrations on the same grid
+            if ideals == None:
+                op, ideals = self._idealCache.ideals(ecal, setScope, measured.frequency)
+            m, s = measured[op.mask], ideals[i]
             
             #if an adapter is connected between the ECal and the VNA port (end of the VNA test port cable)
             #connect the adapter network in between. 
@@ -301,14 +310,17 @@ class VnaCalWizard():
         onePort2: rf.OnePort = self._collectDataOnePort(2, ecal, vnaToEcalPortMap, isCorrected, adapterOnECalPort.get(vnaToEcalPortMap[2]), f)
         
         #measured thru standards
+        ideals : List[Network] = None
         standard : ECalStandardSk
-        for standard in ecal.correctionSets[scope.THRU_AB]:
+        for i, standard in enumerate(ecal.correctionSets[scope.THRU_AB]):
             standard.activate()
             #get two port reading from vna, cropped to frequency subset (if given)
             measured = self._vna.get_network([vnaPorts[0], vnaPorts[1]]).cropped(f)
             
-            #get s-parameter data subset within frequency overlap between standard characterization data and measured (and cropped) data
-            m, s = rf.network.overlap(measured, standard.network)
+            #standard characterization data resampled onto the measured frequencies within their overlap (cached)
+            if ideals == None:
+                op, ideals = self._idealCache.ideals(ecal, scope.THRU_AB, measured.frequency)
+            m, s = measured[op.mask], ideals[i]
             
             measuredStds.append(m)
 
@@ -0,0 +1,121 @@
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+from skrf import Network
+from skrf.frequency import Frequency
+
+from ecalControl import ECalControlSk
+from ecalControl import CorrectionSetScope
+
+
+class InterpolationOperator():
+    '''
+    Linear interpolation of characterization data from a source frequency grid onto the part of a
+    target grid the source covers, the way rf.network.overlap(measured, ideal) resamples the ideal.
+    Held as a (target points, source points) weight matrix, so all standards of a set are resampled
+    with one matrix product.
+    '''
+
+    def __init__(self, fSource: np.ndarray, fTarget: np.ndarray) -> None:
+        fSource = np.asarray(fSource, dtype=float)
+        fTarget = np.asarray(fTarget, dtype=float)
+        if (fTarget[0] > fSource[-1]) | (fSource[0] > fTarget[-1]):
+            raise ValueError("Frequency grids don't overlap.")
+
+        self._mask = (fTarget >= fSource[0]) & (fTarget <= fSource[-1])
+        f = fTarget[self._mask]
+        self._frequency = Frequency.from_f(f, unit="Hz")
+
+        #two neighbouring source points per target point
+        lo = np.clip(np.searchsorted(fSource, f, side="right") - 1, 0, max(len(fSource) - 2, 0))
+        hi = np.minimum(lo + 1, len(fSource) - 1)
+        span = fSource[hi] - fSource[lo]
+        w = np.divide(f - fSource[lo], span, out=np.zeros_like(f), where=span != 0)
+
+        self._weights = np.zeros((len(f), len(fSource)))
+        rows = np.arange(len(f))
+        self._weights[rows, lo] += 1 - w
+        self._weights[rows, hi] += w
+
+
+    @property
+    def frequency(self) -> Frequency:
+        '''Target frequencies covered by the source grid'''
+        return self._frequency
+
+    @property
+    def mask(self) -> np.ndarray:
+        '''Target points covered by the source grid'''
+        return self._mask
+
+
+    def apply(self, s: np.ndarray) -> np.ndarray:
+        '''Resamples s-parameters of shape (..., source points, ports, ports) onto the covered target points'''
+        shape = s.shape
+        flat = s.reshape(shape[:-3] + (shape[-3], shape[-2] * shape[-1]))
+        return (self._weights @ flat).reshape(shape[:-3] + (len(self._frequency), shape[-2], shape[-1]))
+
+
+
+class IdealStandardCache():
+    '''
+    Ideal (characterization) data of ECal correction sets resampled onto a VNA's frequency grid.
+    Interpolation operators are kept per (source grid, target grid) and the resampled sets per
+    (ECal, correction set, target grid), both least recently used first out beyond maxEntries,
+    so repeated calibrations on the same setup skip the resampling.
+    Call clear() after a module's characterization data changed.
+    '''
+
+    def __init__(self, maxEntries: int = 32) -> None:
+        self._maxEntries = maxEntries
+        self._operators : OrderedDict[tuple, InterpolationOperator] = OrderedDict()
+        self._ideals : OrderedDict[tuple, tuple[InterpolationOperator, List[str], np.ndarray]] = OrderedDict()
+
+
+    def clear(self) -> None:
+        self._operators.clear()
+        self._ideals.clear()
+
+    def _lookup(self, entries: OrderedDict, key: tuple) -> any:
+        value = entries.get(key)
+        if value != None: entries.move_to_end(key)
+        return value
+
+    def _insert(self, entries: OrderedDict, key: tuple, value: any) -> None:
+        entries[key] = value
+        while len(entries) > self._maxEntries:
+            entries.popitem(last=False)
+
+
+    def operator(self, fSource: np.ndarray, fTarget: np.ndarray) -> InterpolationOperator:
+        key = (np.asarray(fSource, dtype=float).tobytes(), np.asarray(fTarget, dtype=float).tobytes())
+        op = self._lookup(self._operators, key)
+        if op == None:
+            op = InterpolationOperator(fSource, fTarget)
+            self._insert(self._operators, key, op)
+        return op
+
+
+    def ideals(self, ecal: ECalControlSk, scope: CorrectionSetScope, frequency: Frequency) -> tuple[InterpolationOperator, List[Network]]:
+        '''
+        The correction set's standards resampled onto the covered part of the given frequency grid, in the set's order,
+        and the operator that did it (its mask picks the matching points of a measurement on that grid).
+        The networks are new objects on every call, free to be modified.
+        '''
+        key = (ecal.model, ecal.serialNo, scope, np.asarray(frequency.f, dtype=float).tobytes())
+        entry = self._lookup(self._ideals, key)
+        if entry == None:
+            #the whole set as one stacked array, no Networks needed
+            correctionSet = ecal.correctionSets[scope]
+            op = self.operator(correctionSet.frequencies, frequency.f)
+            entry = (op, [standard.name for standard in correctionSet.standards], op.apply(correctionSet.sParameters))
+            self._insert(self._ideals, key, entry)
+
+        op, names, s = entry
+        networks = []
+        for i in range(len(names)):
+            f = op.frequency.copy()
+            f.unit = frequency.unit
+            networks.append(Network(frequency=f, s=s[i], name=names[i]))
+        return op, networks